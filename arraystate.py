@@ -0,0 +1,140 @@
+import numpy as np
+from state import State
+
+
+class ArrayState(State):
+    """
+    Creates an ArrayState object. An ArrayState is a State that also keeps
+    the position, stats and team of every Unit in contiguous NumPy arrays, one
+    row per Unit, so the whole army can be queried at once. The Units
+    themselves stay plain Units, such that reading the stats of a single Unit
+    is as fast as in a State; the positions and hit points are copied to the
+    arrays whenever they change. The arrays come on top of the Units, so an
+    ArrayState takes more memory per Unit than a State, it trades memory for
+    queries over the whole army.
+    """
+    columns = ('x', 'y', 'hp', 'max_hp', 'atk', 'range', 'move', 'team_id')
+
+    def __init__(self, board_dimensions, threat_map=False,
+                 occupancy_grid=False, capacity=16):
+        """
+        Initializes an ArrayState object with room for capacity Units, the
+        arrays grow when more Units are added.
+        :param board_dimensions: The dimensions of the playing board.
+        :param threat_map: Whether to keep track of the total attack each team
+                           can deal on each cell of the board.
+        :param occupancy_grid: Whether to keep a boolean grid of the taken
+                               cells.
+        :param capacity: The initial number of rows of the arrays.
+        """
+        super().__init__(board_dimensions, threat_map=threat_map,
+                         occupancy_grid=occupancy_grid)
+        self.size = 0
+        self.team_ids = {}
+        self.rows = {}
+        self.row_units = []
+        self.rows_cache = {}
+        for column in self.columns:
+            setattr(self, column, np.zeros(capacity, dtype=np.int64))
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        """
+        Doubles the number of rows of the arrays.
+        """
+        for column in self.columns + ('alive',):
+            old = getattr(self, column)
+            new = np.zeros(2 * len(old), dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, column, new)
+
+    def add_unit(self, unit):
+        """
+        Adds unit to the board, see State, and copies it into a new row of the
+        arrays.
+        :param unit: The Unit to add to the board.
+        :return: The Unit as it is stored on the board.
+        """
+        super().add_unit(unit)
+        if self.size == len(self.alive):
+            self._grow()
+        row = self.size
+        self.size += 1
+        self.rows[unit.id] = row
+        self.row_units.append(unit)
+        for column in self.columns[:-1]:
+            getattr(self, column)[row] = getattr(unit, column)
+        self.team_id[row] = self.team_ids.setdefault(unit.team,
+                                                     len(self.team_ids))
+        self.alive[row] = True
+        self.rows_cache.clear()
+        return unit
+
+    def snapshot(self):
+        """
+        Takes a snapshot of the State, see State, including which rows are
+        alive.
+        :return: The snapshot of the ArrayState.
+        """
+        snapshot = super().snapshot()
+        snapshot['alive'] = self.alive.copy()
+        return snapshot
+
+    def restore(self, snapshot):
+        """
+        Restores the ArrayState in place to the given snapshot, see State, and
+        copies the restored positions and hit points to the arrays.
+        :param snapshot: A snapshot taken by ArrayState.snapshot.
+        """
+        super().restore(snapshot)
+        for unit, x, y, hp in snapshot['units']:
+            row = self.rows[unit.id]
+            self.x[row], self.y[row], self.hp[row] = x, y, hp
+        self.alive[:len(snapshot['alive'])] = snapshot['alive']
+        self.rows_cache.clear()
+
+    def simulate_move(self, unit, new_pos):
+        """
+        Simulates a move, see State, and copies the new position of unit to
+        the arrays.
+        :param unit: The Unit that wants to move.
+        :param new_pos: The new position unit wants to move to.
+        """
+        super().simulate_move(unit, new_pos)
+        row = self.rows[unit.id]
+        self.x[row], self.y[row] = new_pos
+
+    def simulate_attack(self, unit, attacked_unit):
+        """
+        Simulates an attack by unit on attacked_unit, see State. Also copies
+        the hit points of attacked_unit to the arrays and marks its row as
+        dead if it dies.
+        :param unit: Unit that makes an attack.
+        :param attacked_unit: Unit that is attacked by unit.
+        """
+        super().simulate_attack(unit, attacked_unit)
+        row = self.rows[attacked_unit.id]
+        self.hp[row] = attacked_unit.hp
+        if attacked_unit.is_dead():
+            self.alive[row] = False
+            self.rows_cache.clear()
+
+    def rows_of(self, team, enemies=False):
+        """
+        Gets the rows of the living Units of team, or of the living Units not
+        on team if enemies is set. The rows are in the order the Units were
+        added, which is the order of State.allies_of and State.enemies_of.
+        They are computed once until a Unit is added or dies.
+        :param team: The team to select.
+        :param enemies: Whether to select the opposing team(s) instead.
+        :return: An array of row indices.
+        """
+        key = (team, enemies)
+        rows = self.rows_cache.get(key)
+        if rows is None:
+            team_id = self.team_ids.get(team, -1)
+            on_team = self.team_id[:self.size] == team_id
+            rows = np.flatnonzero(self.alive[:self.size] &
+                                  (~on_team if enemies else on_team))
+            self.rows_cache[key] = rows
+        return rows
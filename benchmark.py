@@ -0,0 +1,376 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import numpy as np
+from unit import Unit
+from unitcontrollers import AIUnitController, GeneUnitController
+from statecontroller import StateController
+from evolutionaryalgorithm import EvoluationaryAlgorithm
+from batchsimulator import BatchSimulator
+
+
+# The unit stats of the main.py armies, repeated to fill larger armies.
+STATS = [
+    {'hp': 30, 'atk': 4, 'range': 1, 'move': 3},
+    {'hp': 45, 'atk': 2, 'range': 1, 'move': 2},
+    {'hp': 25, 'atk': 6, 'range': 2, 'move': 3},
+    {'hp': 20, 'atk': 6, 'range': 2, 'move': 3},
+    {'hp': 35, 'atk': 2, 'range': 1, 'move': 3},
+]
+
+GENES = {'initiative': 0.5, 'greed': 0.5, 'focus': 0.5, 'teamplayer': 0.5,
+         'evasiveness': 0.5}
+
+# The simulation options of the EvoluationaryAlgorithm that are compared by
+# the backend benchmarks, 'default' is the baseline of the speedups.
+BACKENDS = {
+    'default': {},
+    'vectorized': {'vectorized': True},
+    'threat_map': {'threat_map': True},
+    'threat_map+vectorized': {'threat_map': True, 'vectorized': True},
+    'array_state': {'array_state': True},
+    'array_state+vectorized': {'array_state': True, 'vectorized': True},
+    'occupancy_grid+vectorized': {'occupancy_grid': True,
+                                  'vectorized': True},
+    'fast_forward': {'fast_forward': True},
+    'batched': {'batched': True},
+}
+
+# The minimum number of noise spreads a benchmark has to slow down by to be
+# flagged as a regression.
+NOISE_FACTOR = 2
+
+# The minimum number of repeats both runs of a benchmark need for it to be
+# flagged as a regression, fewer repeats do not show how noisy it is.
+MIN_REPEATS = 5
+
+
+def armies(army_size, board_size, gap):
+    """
+    Creates two armies of army_size Units facing each other in the middle of
+    the board, in columns of at most 20 Units.
+    :param army_size: The number of Units per side.
+    :param board_size: The dimensions of the board.
+    :param gap: The number of columns between the two armies.
+    :return: A tuple of the 'Chaos' Units and the 'Order' Units.
+    """
+    center_x, center_y = board_size[0] // 2, board_size[1] // 2
+    chaos, order = [], []
+    for i in range(army_size):
+        column, row = divmod(i, 20)
+        y = center_y - 10 + row
+        stats = STATS[i % len(STATS)]
+        chaos.append(Unit((center_x - gap // 2 - 2 * column, y), stats,
+                          team='Chaos', name=f'C{i}'))
+        order.append(Unit((center_x + gap - gap // 2 + 2 * column, y), stats,
+                          team='Order', name=f'O{i}'))
+    return chaos, order
+
+
+def fits(army_size, board_size, gap):
+    """
+    Checks whether two armies of army_size Units fit on the board.
+    """
+    return all(0 <= u.x < board_size[0] and 0 <= u.y < board_size[1]
+               for army in armies(army_size, board_size, gap) for u in army)
+
+
+def game(army_size, board_size, gap, **options):
+    """
+    Sets up a game of gene controlled 'Chaos' Units against AI controlled
+    'Order' Units.
+    :param options: Options of the StateController.
+    :return: The StateController of the game.
+    """
+    chaos, order = armies(army_size, board_size, gap)
+    sc = StateController(board_size, ['Order', 'Chaos'], **options)
+    ucs = [AIUnitController(u, sc.state) for u in order]
+    for uc in ucs:
+        uc.seed_random(1)
+    ucs += [GeneUnitController(u, sc.state, GENES) for u in chaos]
+    sc.add_unit_controllers(ucs)
+    return sc
+
+
+def timing(times, number):
+    """
+    Summarizes the seconds per call of every repeat of a benchmark.
+    :return: A dictionary with the median and minimum seconds per call.
+    """
+    return {'seconds': statistics.median(times), 'min': min(times),
+            'repeats': len(times), 'number': number, 'times': times}
+
+
+def time_calls(function, number):
+    """
+    Times number calls of function.
+    :return: The seconds per call.
+    """
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - start) / number
+
+
+def measure(function, repeats, number=1):
+    """
+    Times function, number calls per repeat.
+    :return: A dictionary with the median and minimum seconds per call.
+    """
+    return timing([time_calls(function, number) for _ in range(repeats)],
+                  number)
+
+
+def measure_interleaved(benchmarks, repeats, seconds=0.1):
+    """
+    Times every function of benchmarks, with as many calls per repeat as
+    take at least seconds. The repeats of the benchmarks take turns, such
+    that the repeats of every benchmark are spread over the whole
+    measurement and their spread also shows the machine slowing down in the
+    meantime.
+    :param benchmarks: A dictionary of benchmark name to function.
+    :return: A dictionary of benchmark name to timing.
+    """
+    numbers = {}
+    for name, function in benchmarks.items():
+        number = 1
+        while time_calls(function, number) * number < seconds:
+            number *= 2
+        numbers[name] = number
+    times = {name: [] for name in benchmarks}
+    for _ in range(repeats):
+        for name, function in benchmarks.items():
+            times[name].append(time_calls(function, numbers[name]))
+    return {name: timing(times[name], numbers[name]) for name in benchmarks}
+
+
+def noise(timing):
+    """
+    Estimates the relative noise of a timing as the spread between its
+    slowest and its fastest repeat, 0 for a single repeat.
+    """
+    return (max(timing['times']) - timing['min']) / timing['min']
+
+
+def micro_benchmarks(army_size, board_size, repeats):
+    """
+    Times the hot functions of the simulator on a game where the armies are
+    in contact.
+    :return: A dictionary of benchmark name to timing.
+    """
+    sc = game(army_size, board_size, gap=3)
+    state = sc.state
+    ai = next(uc for uc in sc.unit_controllers
+              if isinstance(uc, AIUnitController))
+    gene = next(uc for uc in sc.unit_controllers
+                if isinstance(uc, GeneUnitController))
+    target = (gene.unit.x + 1, gene.unit.y)
+    prefix = f'micro/{army_size}v{army_size}/{board_size[0]}x{board_size[1]}'
+    return measure_interleaved({
+        f'{prefix}/possible_moves': gene.possible_moves,
+        f'{prefix}/movement_allowed':
+            lambda: state.movement_allowed(gene.unit, target),
+        f'{prefix}/gene_next_movement': gene.next_movement,
+        f'{prefix}/gene_next_attack': gene.next_attack,
+        f'{prefix}/ai_get_closest_enemy': ai.get_closest_enemy,
+        f'{prefix}/game_finished': state.game_finished,
+    }, repeats)
+
+
+def free_cells_benchmarks(board_size, repeats):
+    """
+    Times finding the free cells of a diamond as an array for the vectorized
+    GeneUnitControllers, by checking the cells one by one (default) and by
+    looking them up in the occupancy grid, for a Unit in a packed army.
+    :return: A dictionary of benchmark name to timing.
+    """
+    state = game(50, board_size, gap=3, occupancy_grid=True).state
+    unit = state.units[len(state.units) // 4 + 10]
+    prefix = f'micro/free_cells/{board_size[0]}x{board_size[1]}'
+    benchmarks = {}
+    for radius in (2, 3, 5, 8):
+        benchmarks[f'{prefix}/r{radius}/default'] = \
+            lambda radius=radius: np.array(
+                list(state.free_cells(unit, radius)), dtype=np.int64)
+        benchmarks[f'{prefix}/r{radius}/occupancy_grid'] = \
+            lambda radius=radius: state.free_cells_array(unit, radius)
+    return measure_interleaved(benchmarks, repeats)
+
+
+def macro_benchmarks(army_size, board_size, repeats, pop_size):
+    """
+    Times whole games and an epoch of the evolutionary algorithm, with the
+    armies 50 columns apart as in main.py.
+    :return: A dictionary of benchmark name to timing.
+    """
+    prefix = f'macro/{army_size}v{army_size}/{board_size[0]}x{board_size[1]}'
+    turns = []
+
+    def process_game():
+        sc = game(army_size, board_size, gap=50)
+        sc.turn_complete_callback = lambda turn, state: turns.append(turn)
+        sc.process_game()
+
+    results = {f'{prefix}/process_game': measure(process_game, repeats)}
+    results[f'{prefix}/process_game']['turns'] = max(turns)
+
+    def epoch():
+        chaos, order = armies(army_size, board_size, gap=50)
+        ea = EvoluationaryAlgorithm(board_size, chaos,
+                                    [AIUnitController(u, None) for u in order],
+                                    ['Order', 'Chaos'], random_seed=2112)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ea.ea(pop_size=pop_size, epochs=1)
+
+    results[f'{prefix}/ea_epoch'] = measure(epoch, repeats)
+    return results
+
+
+def backend_benchmarks(army_size, board_size, repeats, games):
+    """
+    Times the same games with every set of simulation options of BACKENDS,
+    with the armies 50 columns apart as in main.py. Every backend has to give
+    the same scores as the default one.
+    :param games: The number of games (random genes) per repeat.
+    :return: A dictionary of benchmark name to timing.
+    """
+    prefix = f'backend/{army_size}v{army_size}/{board_size[0]}x{board_size[1]}'
+    chaos, order = armies(army_size, board_size, gap=50)
+    results = {}
+    default_scores = None
+    for name, options in BACKENDS.items():
+        ea = EvoluationaryAlgorithm(board_size, chaos,
+                                    [AIUnitController(u, None) for u in order],
+                                    ['Order', 'Chaos'], random_seed=2112,
+                                    **options)
+        ea.random = random.Random(0)
+        population = ea.init_pop(games)
+        scores = []
+
+        def play():
+            if ea.batched:
+                simulator = BatchSimulator(board_size, ea.team_ordering,
+                                           ea.enemy_ucs, ea.ea_units,
+                                           ea.random_seed,
+                                           max_turns=ea.max_turns,
+                                           stalemate_turns=ea.stalemate_turns)
+                scores[:] = simulator.simulate(population)
+            else:
+                scores[:] = [ea.simulation(genes) for genes in population]
+
+        ea.simulation(population[0])
+        results[f'{prefix}/{name}'] = measure(play, repeats)
+        if default_scores is None:
+            default_scores = list(scores)
+        assert scores == default_scores, f'{name} gives other scores'
+    return results
+
+
+def speedups(results):
+    """
+    Prints the speedup of every benchmark over the default variant of the
+    same benchmark, comparing the fastest repeats.
+    """
+    for name, timing in sorted(results.items()):
+        prefix, _, variant = name.rpartition('/')
+        default = results.get(f'{prefix}/default')
+        if default is None or variant == 'default':
+            continue
+        print(f'{name}: {default["min"] / timing["min"]:.2f}x speedup')
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares results to a baseline and prints the ratio of every benchmark.
+    The fastest repeat is compared, which is the least affected by noise. A
+    benchmark only regressed if both runs have at least MIN_REPEATS repeats
+    and it slowed down by more than threshold and by more than NOISE_FACTOR
+    times the spread of the repeats of either run, such that noisy
+    benchmarks need a larger slowdown to be flagged.
+    :param threshold: The minimum relative slowdown for a benchmark to be
+                      flagged as a regression.
+    :return: The names of the regressed benchmarks.
+    """
+    regressions = []
+    for name, timing in sorted(results.items()):
+        if name not in baseline:
+            print(f'{name}: new')
+            continue
+        ratio = timing['min'] / baseline[name]['min']
+        limit = max(threshold, NOISE_FACTOR * max(noise(timing),
+                                                  noise(baseline[name])))
+        flag = ''
+        if min(timing['repeats'], baseline[name]['repeats']) < MIN_REPEATS:
+            flag = ' (too few repeats to flag)'
+        elif ratio > 1 + limit:
+            flag = ' REGRESSION'
+            regressions.append(name)
+        print(f'{name}: {ratio:.2f}x (limit {1 + limit:.2f}x){flag}')
+    return regressions
+
+
+def main(argv=None):
+    """
+    Runs the benchmarks, writes them to a JSON file and optionally compares
+    them with a baseline file. Exits with status 1 if a benchmark regressed.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the simulator and the evolutionary algorithm.'
+    )
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', metavar='BASELINE')
+    parser.add_argument('--threshold', type=float, default=0.1)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[6, 10, 50, 200])
+    parser.add_argument('--boards', type=int, nargs='+', default=[100, 500],
+                        help='widths of square boards')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--macro-repeats', type=int, default=5)
+    parser.add_argument('--pop-size', type=int, default=10)
+    parser.add_argument('--games', type=int, default=10,
+                        help='games per repeat of the backend benchmarks')
+    parser.add_argument('--skip-macro', action='store_true')
+    parser.add_argument('--skip-backends', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for board in args.boards:
+        results.update(free_cells_benchmarks((board, board), args.repeats))
+        for size in args.sizes:
+            board_size = (board, board)
+            if not fits(size, board_size, gap=50):
+                continue
+            results.update(micro_benchmarks(size, board_size, args.repeats))
+            if not args.skip_macro:
+                results.update(macro_benchmarks(size, board_size,
+                                                args.macro_repeats,
+                                                args.pop_size))
+            if not args.skip_backends:
+                results.update(backend_benchmarks(size, board_size,
+                                                  args.macro_repeats,
+                                                  args.games))
+    with open(args.output, 'w') as f:
+        f.write(json.dumps({
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.time(),
+            'results': results
+        }, indent=2))
+
+    speedups(results)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.loads(f.read())['results']
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import json
+import os
+import pickle
+from collections import deque
+
+
+def save_checkpoint(file_name, checkpoint):
+    """
+    Writes checkpoint to file_name. The checkpoint is written to a temporary
+    file first and then moved over file_name, such that a crash while writing
+    keeps the previous checkpoint intact.
+    :param file_name: The name of the checkpoint file.
+    :param checkpoint: A picklable dictionary.
+    """
+    temporary = f'{file_name}.tmp'
+    with open(temporary, 'wb') as f:
+        pickle.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, file_name)
+
+
+def load_checkpoint(file_name):
+    """
+    Reads a checkpoint that was written by save_checkpoint.
+    :param file_name: The name of the checkpoint file.
+    :return: The checkpoint dictionary.
+    """
+    with open(file_name, 'rb') as f:
+        return pickle.load(f)
+
+
+class EpochLog:
+    """
+    Creates an EpochLog object. An EpochLog appends the scores and the best
+    genes of every epoch to a file as a line of JSON, such that they do not
+    have to be kept in memory.
+    """
+
+    def __init__(self, file_name, size=0):
+        """
+        Opens the log, keeping only its first size bytes. A resumed run
+        passes the size of the log at its checkpoint, which drops the epochs
+        that were logged after the checkpoint.
+        :param file_name: The name of the log file.
+        :param size: The number of bytes of the log to keep.
+        """
+        self.file = open(file_name, 'a+')
+        self.file.truncate(size)
+        self.file.seek(size)
+
+    def append(self, epoch, scores, best):
+        """
+        Appends an epoch to the log.
+        :param epoch: The number of the epoch.
+        :param scores: The sorted scores of the population.
+        :param best: The best genes of the population.
+        """
+        self.file.write(json.dumps({'epoch': epoch, 'scores': scores,
+                                    'best': best}) + '\n')
+        self.file.flush()
+
+    def size(self):
+        """
+        Gets the number of bytes written to the log.
+        """
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def read(file_name, last=None):
+        """
+        Reads a log, or only its last epochs.
+        :param file_name: The name of the log file.
+        :param last: The number of epochs at the end of the log to read, all
+                     epochs are read if it is None.
+        :return: A tuple of the scores and the best genes of every epoch that
+                 is read.
+        """
+        epochs = deque(maxlen=last)
+        with open(file_name) as f:
+            for line in f:
+                epochs.append(json.loads(line))
+        return ([epoch['scores'] for epoch in epochs],
+                [epoch['best'] for epoch in epochs])
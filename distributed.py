@@ -0,0 +1,351 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+import unitcontrollers
+from unit import Unit
+from evolutionaryalgorithm import EvoluationaryAlgorithm
+
+
+# Every message is a JSON document preceded by its length in bytes.
+LENGTH = struct.Struct('<I')
+
+# The EvoluationaryAlgorithm options that are sent to the workers.
+OPTIONS = ['vectorized', 'threat_map', 'array_state', 'batched', 'max_turns',
+           'stalemate_turns', 'fast_forward', 'occupancy_grid']
+
+
+def send_message(connection, message):
+    """
+    Sends message as a JSON document over connection.
+    """
+    data = json.dumps(message).encode()
+    connection.sendall(LENGTH.pack(len(data)) + data)
+
+
+def _receive_exactly(connection, size):
+    """
+    Receives size bytes from connection, or None if it was closed first.
+    """
+    data = b''
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def receive_message(connection):
+    """
+    Receives a JSON document from connection.
+    :return: The message, or None if connection was closed.
+    """
+    length = _receive_exactly(connection, LENGTH.size)
+    if length is None:
+        return None
+    data = _receive_exactly(connection, LENGTH.unpack(length)[0])
+    if data is None:
+        return None
+    return json.loads(data.decode())
+
+
+def parse_address(address):
+    """
+    Parses 'host:port' into a TCP address, anything else is the path of a
+    Unix socket.
+    """
+    host, separator, port = address.rpartition(':')
+    if separator and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def scenario_definition(ea):
+    """
+    Describes the scenario of ea such that a worker can rebuild it: the
+    original stats of the Units, the enemy UnitController types, the board
+    size, the team ordering, the random seed and the simulation options.
+    """
+    return {
+        'ea_units': [u.original_stats for u in ea.ea_units],
+        'enemy_ucs': [[type(uc).__name__, uc.unit.original_stats]
+                      for uc in ea.enemy_ucs],
+        'board_size': ea.board_size,
+        'team_ordering': ea.team_ordering,
+        'random_seed': ea.random_seed,
+        'options': {option: getattr(ea, option) for option in OPTIONS}
+    }
+
+
+def ea_from_definition(definition):
+    """
+    Creates an EvoluationaryAlgorithm from a scenario_definition. The enemy
+    UnitControllers are created by their class name from unitcontrollers.
+    """
+    def unit(stats):
+        return Unit(tuple(stats['location']), stats['stats'], stats['team'],
+                    stats['name'])
+
+    enemy_ucs = [getattr(unitcontrollers, uc_type)(unit(stats), None)
+                 for uc_type, stats in definition['enemy_ucs']]
+    return EvoluationaryAlgorithm(tuple(definition['board_size']),
+                                  [unit(s) for s in definition['ea_units']],
+                                  enemy_ucs, definition['team_ordering'],
+                                  random_seed=definition['random_seed'],
+                                  **definition['options'])
+
+
+class Coordinator:
+    """
+    Creates a Coordinator object. A Coordinator hands out the simulations of
+    an EvoluationaryAlgorithm to worker processes that connect to it over TCP
+    or a Unix socket, on this host or on others. Every worker gets the
+    scenario once and then pulls batches of genes, the batches of a worker
+    that is lost are handed to the other workers again. A simulation fails
+    when every worker is lost, or when it takes longer than the deadline.
+    """
+
+    def __init__(self, ea, address, batch_size=1, timeout=None,
+                 max_retries=3, deadline=None):
+        """
+        Initializes a Coordinator object.
+        :param ea: The EvoluationaryAlgorithm whose simulations are handed
+                   out.
+        :param address: A (host, port) tuple to listen on over TCP, port 0
+                        picks a free port, or the path of a Unix socket.
+        :param batch_size: The number of genes per batch.
+        :param timeout: The number of seconds a worker may take for a batch
+                        before it is considered lost, if any.
+        :param max_retries: The number of times a batch is handed out again
+                            before the simulation fails.
+        :param deadline: The number of seconds a simulation may take before
+                         it fails, if any.
+        """
+        assert batch_size > 0
+        self.scenario = scenario_definition(ea)
+        self.address = address
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.tasks = queue.Queue()
+        self.condition = threading.Condition()
+        self.round = 0
+        self.scores = {}
+        self.failure = None
+        self.workers = 0
+        self.server = None
+
+    def start(self):
+        """
+        Starts listening for workers, the address is replaced by the address
+        that is actually listened on.
+        :return: The Coordinator.
+        """
+        if isinstance(self.address, str):
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(self.address)
+        self.server.listen()
+        self.address = self.server.getsockname()
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def close(self):
+        """
+        Stops the workers and stops listening.
+        """
+        self.tasks.put(None)
+        if self.server is not None:
+            self.server.close()
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.unlink(self.address)
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _accept(self):
+        """
+        Serves every worker that connects in its own thread.
+        """
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except (OSError, AttributeError):
+                return
+            threading.Thread(target=self._serve, args=(connection,),
+                             daemon=True).start()
+
+    def _serve(self, connection):
+        """
+        Sends the scenario to a worker and hands it batches until the
+        Coordinator is closed or the worker is lost, counting the connected
+        workers meanwhile.
+        """
+        with connection:
+            connection.settimeout(self.timeout)
+            try:
+                send_message(connection, {'scenario': self.scenario})
+            except OSError:
+                return
+            with self.condition:
+                self.workers += 1
+                self.condition.notify_all()
+            try:
+                self._hand_out(connection)
+            finally:
+                with self.condition:
+                    self.workers -= 1
+                    self.condition.notify_all()
+
+    def _hand_out(self, connection):
+        """
+        Hands batches to a connected worker until the Coordinator is closed
+        or the worker is lost.
+        """
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                self.tasks.put(None)
+                try:
+                    send_message(connection, {'stop': True})
+                except OSError:
+                    pass
+                return
+            game_round, index, (genes, random_seeds), attempts = task
+            try:
+                send_message(connection, {'genes': genes,
+                                          'random_seeds': random_seeds})
+                reply = receive_message(connection)
+            except (OSError, ValueError):
+                reply = None
+            if reply is None or len(reply['scores']) != len(genes):
+                self._retry(task)
+                return
+            with self.condition:
+                if game_round == self.round:
+                    self.scores[index] = reply['scores']
+                    self.condition.notify_all()
+
+    def _retry(self, task):
+        """
+        Hands out the batch of a lost worker again, or fails the simulation
+        if it was handed out too often.
+        """
+        game_round, index, genes, attempts = task
+        if attempts < self.max_retries:
+            self.tasks.put((game_round, index, genes, attempts + 1))
+            return
+        with self.condition:
+            if game_round == self.round:
+                self.failure = (f'Batch {index} was lost {attempts + 1} '
+                                f'times')
+                self.condition.notify_all()
+
+    def map(self, function, genes, random_seeds):
+        """
+        Simulates all genes with their random seeds on the workers, like the
+        map of a process pool. The workers always run the simulation of the
+        EvoluationaryAlgorithm, which is what function does in a pool. It
+        waits for workers to connect, but fails once a worker was connected
+        and none is left, or when the deadline passes.
+        :return: The scores, in the order of genes.
+        """
+        genes, random_seeds = list(genes), list(random_seeds)
+        batches = [(genes[i:i + self.batch_size],
+                    random_seeds[i:i + self.batch_size])
+                   for i in range(0, len(genes), self.batch_size)]
+        with self.condition:
+            self.round += 1
+            self.scores = {}
+            self.failure = None
+            connected = self.workers > 0
+        for index, batch in enumerate(batches):
+            self.tasks.put((self.round, index, batch, 0))
+
+        def finished():
+            nonlocal connected
+            if len(self.scores) == len(batches):
+                return True
+            connected = connected or self.workers > 0
+            if connected and not self.workers and not self.failure:
+                self.failure = 'No worker is left'
+            return self.failure
+
+        with self.condition:
+            if not self.condition.wait_for(finished, self.deadline):
+                self.failure = (f'The simulation did not finish within '
+                                f'{self.deadline} seconds')
+            if self.failure:
+                self._discard_tasks()
+                raise RuntimeError(self.failure)
+            return [score for index in range(len(batches))
+                    for score in self.scores[index]]
+
+    def _discard_tasks(self):
+        """
+        Discards the batches that were not handed out yet, such that they are
+        not simulated after the simulation failed.
+        """
+        try:
+            while True:
+                if self.tasks.get_nowait() is None:
+                    self.tasks.put(None)
+                    return
+        except queue.Empty:
+            pass
+
+
+def run_worker(address, connect_attempts=10, delay=1.0):
+    """
+    Connects to a Coordinator and simulates the batches it hands out until it
+    is closed.
+    :param address: The address of the Coordinator, see Coordinator.
+    :param connect_attempts: The number of times to try to connect.
+    :param delay: The number of seconds between connection attempts.
+    """
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    for attempt in range(connect_attempts):
+        connection = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            connection.connect(address)
+            break
+        except OSError:
+            connection.close()
+            if attempt == connect_attempts - 1:
+                raise
+            time.sleep(delay)
+    with connection:
+        message = receive_message(connection)
+        if message is None:
+            return
+        ea = ea_from_definition(message['scenario'])
+        while True:
+            message = receive_message(connection)
+            if message is None or 'stop' in message:
+                return
+            scores = ea.evaluate_seeds(message['genes'],
+                                       message['random_seeds'])
+            send_message(connection, {'scores': scores})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Simulates games for a Coordinator.'
+    )
+    parser.add_argument('address', help='host:port or the path of a Unix '
+                                        'socket')
+    parser.add_argument('--connect-attempts', type=int, default=10)
+    args = parser.parse_args()
+    run_worker(parse_address(args.address), args.connect_attempts)
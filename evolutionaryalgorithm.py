@@ -1,24 +1,132 @@
+import copy
+import math
+import os
 import random
-from statecontroller import StateController
+import multiprocessing
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from fitnesscache import FitnessCache
+from checkpoint import save_checkpoint, load_checkpoint, EpochLog
+from batchsimulator import BatchSimulator
+from scenario import Scenario
 from unitcontrollers import GeneUnitController
 from collections import defaultdict
 
 
+# The EvoluationaryAlgorithm a pool worker evaluates genes with, set once per
+# worker process by _init_worker.
+_worker_ea = None
+
+
+def _init_worker(ea):
+    """
+    Initializer for the worker processes of the simulation pool, stores the
+    EvoluationaryAlgorithm so it is only sent to each worker once.
+    """
+    global _worker_ea
+    _worker_ea = ea
+
+
+def _worker_simulation(genes, random_seed):
+    """
+    Runs a simulation for the given genes and random seed in a pool worker.
+    """
+    return _worker_ea.seed_ea(random_seed).simulation(genes)
+
+
+def _run_island(ea, island, seed, islands, pop_size, epochs, point_mutate,
+                migration_interval, migrants, topology, inboxes, results):
+    """
+    Runs one island of EvoluationaryAlgorithm.island_ea in its own process
+    and puts (island, result) on the results queue, or (island, None,
+    traceback) if it failed.
+    """
+    try:
+        ea.evolution_seed = seed
+        ea.random.seed(seed)
+        ea.generator = np.random.default_rng(seed)
+        result = ea._island_ea(island, islands, pop_size, epochs,
+                               point_mutate, migration_interval, migrants,
+                               topology, inboxes)
+        results.put((island, result))
+    except Exception:
+        results.put((island, None, traceback.format_exc()))
+
+
 class EvoluationaryAlgorithm:
     def __init__(self, board_size, ea_units, enemy_ucs, team_ordering,
-                 random_seed=1):
+                 random_seed=1, cache_size=1024, vectorized=False,
+                 threat_map=False, array_state=False, batched=False,
+                 instrumentation=None, max_turns=1000, stalemate_turns=None,
+                 fast_forward=False, occupancy_grid=False,
+                 array_genomes=False, racing_seeds=None, racing_initial=1,
+                 racing_keep=0.5, replay_dir=None):
         """
         Initializes an EvolutionaryAlgorithm, takes the board size, the units
         to learn, the team ordering and the enemy unit *controllers* as
-        arguments. You can also set the random seed through this initializer.
+        arguments. You can also set the random seed, the number of scores
+        kept in the fitness cache (0 disables it), whether the gene unit
+        controllers score their moves with NumPy, whether the games keep a
+        threat map and whether they store the units in an ArrayState through
+        this initializer. If batched is set, all games of an epoch are played
+        together by a BatchSimulator (the enemy unit controllers must be
+        AIUnitControllers), instead of one by one. An Instrumentation can be
+        given to measure the games simulated in this process. A game ends
+        after max_turns turns, or after stalemate_turns turns without damage
+        done and without the teams getting closer, if these are set. If
+        fast_forward is set, the turns in which the teams are too far apart to
+        interact only move the units, with approach moves that still score
+        every possible move but do not check the enemies for every move. If
+        occupancy_grid is set, the free cells are found with a NumPy grid of
+        occupied cells.
+        If array_genomes is set, a population is a population x units x genes
+        array that is initialized, crossed over and mutated at once by a NumPy
+        generator, which is seeded once with the random seed. The genomes are
+        converted to dictionaries only to be simulated and returned.
+        If racing_seeds is given, the fitness of an individual is its average
+        score over several random seeds, found by successive halving: all
+        individuals play the first racing_initial seeds, only the best
+        racing_keep fraction plays the next seeds, twice as many, and so on.
+        racing_initial must be at least 1 and racing_keep in (0, 1].
+        If replay_dir is given, every game that is simulated is recorded to a
+        replay in that directory, named after the fitness cache key of the
+        game, see ReplayRecorder. Batched games cannot be recorded.
         """
+        if racing_initial < 1:
+            raise ValueError(f'racing_initial must be at least 1, not '
+                             f'{racing_initial}')
+        if not 0 < racing_keep <= 1:
+            raise ValueError(f'racing_keep must be in (0, 1], not '
+                             f'{racing_keep}')
+        if batched and replay_dir is not None:
+            raise ValueError('Batched games cannot be recorded to replays')
         self.board_size = board_size
         self.ea_units = ea_units
         self.enemy_ucs = enemy_ucs
         self.team_ordering = team_ordering
         self.random_seed = random_seed
+        self.evolution_seed = random_seed
         self.random = random.Random()
         self.random.seed(self.random_seed)
+        self.cache = FitnessCache(cache_size)
+        self.vectorized = vectorized
+        self.threat_map = threat_map
+        self.array_state = array_state
+        self.batched = batched
+        self.instrumentation = instrumentation
+        self.max_turns = max_turns
+        self.stalemate_turns = stalemate_turns
+        self.fast_forward = fast_forward
+        self.occupancy_grid = occupancy_grid
+        self.array_genomes = array_genomes
+        self.racing_seeds = racing_seeds
+        self.racing_initial = racing_initial
+        self.racing_keep = racing_keep
+        self.replay_dir = replay_dir
+        self.seed_eas = {}
+        self.generator = np.random.default_rng(random_seed)
+        self.game_scenario = None
 
     def rand_value(self):
         """
@@ -50,11 +158,32 @@ class EvoluationaryAlgorithm:
         """
         Initialize a population of size n.
         """
+        if self.array_genomes:
+            return self.init_pop_array(pop_size)
         population = []
         for _ in range(pop_size):
             population.append(self.init_individual())
         return population
 
+    def init_pop_array(self, pop_size):
+        """
+        Initialize an array encoded population of size n, with the same
+        values as init_unit.
+        """
+        shape = (pop_size, len(self.ea_units),
+                 len(GeneUnitController.gene_names))
+        return self.generator.integers(0, 100, shape) / 100
+
+    def genes_dict(self, genome):
+        """
+        Converts an array encoded genome to a dictionary of genes for a team
+        of units, dictionaries are returned as they are.
+        """
+        if isinstance(genome, dict):
+            return genome
+        return {u.name: GeneUnitController.genes_from_array(values)
+                for u, values in zip(self.ea_units, genome)}
+
     def crossover(self, p1, p2):
         """
         Create two new individuals based on two parents
@@ -86,6 +215,41 @@ class EvoluationaryAlgorithm:
                     val = self.random.randrange(from_range, until_range, 1) / 100
                     genes[u][g] = val
 
+    def crossover_array(self, p1, p2):
+        """
+        Create two arrays of new individuals based on two arrays of parents,
+        every gene comes from either parent with equal chance.
+        """
+        take_p1 = self.generator.random(p1.shape) >= 0.5
+        return np.where(take_p1, p1, p2), np.where(take_p1, p2, p1)
+
+    def mutate_array(self, genes, point_mutate):
+        """
+        Mutate the genes of an array of individuals in place, like mutate.
+        """
+        mutated = self.generator.random(genes.shape) < point_mutate
+        old = (genes[mutated] * 100).astype(int)
+        from_range = np.maximum(0, old - 50)
+        until_range = np.minimum(old + 50, 100)
+        genes[mutated] = self.generator.integers(from_range, until_range) / 100
+
+    def weighted_random_array(self, weights, size, exclude=None):
+        """
+        Picks size indices with a chance proportional to weights, like
+        weighted_random. If exclude is given, the i-th pick never is
+        exclude[i].
+        """
+        cumulative = np.cumsum(weights)
+        total = np.full(size, cumulative[-1], dtype=float)
+        if exclude is not None:
+            total -= weights[exclude]
+        r = self.generator.random(size) * total
+        if exclude is not None:
+            start = cumulative[exclude] - weights[exclude]
+            r += np.where(r >= start, weights[exclude], 0)
+        picks = np.searchsorted(cumulative, r, side='right')
+        return np.minimum(picks, len(weights) - 1)
+
     def weighted_random(self, pairs):
         """
         Applies weighted random on tuples of (object, int), where the integers
@@ -98,75 +262,441 @@ class EvoluationaryAlgorithm:
             r -= weight
             if r <= 0: return value, weight
 
-    def get_enemy_ucs(self, state):
-        """
-        Create a list of enemy Unit Controllers, this is done by resetting the
-        known unit controllers such that the units in them are the same as they
-        originally were.
-        """
-        res = []
-        for uc in self.enemy_ucs:
-            uc.reset_unit()
-            uc.state = state
-            res.append(uc)
-        return res
-        
     def simulation(self, genes):
         """
         Applies the given set of genes to a game and returns the score for the
-        EA team.
+        EA team. The game is set up once and restored for every simulation.
+        Every game starts from the same enemy random state, such that the
+        score only depends on the genes and not on the games played before.
+        The game is recorded to a replay if replay_dir is set.
         """
-        sc = StateController(self.board_size, self.team_ordering)
-
-        all_ucs = self.get_enemy_ucs(sc.state)
-        for u in self.ea_units:
-            orig_unit = u.clone_original()
-            guc = GeneUnitController(orig_unit, sc.state, genes[u.name])
-            all_ucs.append(guc)
-
-        sc.add_unit_controllers(all_ucs)
-        sc.process_game()
-        playing_team = self.ea_units[0].team
-        return sc.state.evaluate_game(playing_team)
+        if self.game_scenario is None:
+            self.game_scenario = Scenario(self.board_size, self.team_ordering,
+                                          self.enemy_ucs, self.ea_units,
+                                          self.random_seed,
+                                          threat_map=self.threat_map,
+                                          array_state=self.array_state,
+                                          vectorized=self.vectorized,
+                                          instrumentation=self.instrumentation,
+                                          max_turns=self.max_turns,
+                                          stalemate_turns=self.stalemate_turns,
+                                          fast_forward=self.fast_forward,
+                                          occupancy_grid=self.occupancy_grid)
+        replay_file = None
+        if self.replay_dir is not None:
+            replay_file = os.path.join(
+                self.replay_dir,
+                f'{FitnessCache.key(genes, self.scenario())}.replay')
+        return self.game_scenario.play(genes, replay_file)
 
     def seed_random(self):
         """
         Seeds the enemy unit controllers.
         """
-        self.random.seed(self.random_seed)
+        self.random.seed(self.evolution_seed)
         for uc in self.enemy_ucs:
             uc.seed_random(self.random_seed)
 
-    def ea(self, pop_size=10, epochs=100, point_mutate=0.15):
+    def seed_ea(self, random_seed):
+        """
+        Gets an EvoluationaryAlgorithm that plays the same scenario with the
+        enemy unit controllers seeded by random_seed, it shares the fitness
+        cache of this one.
+        """
+        if random_seed == self.random_seed:
+            return self
+        if random_seed not in self.seed_eas:
+            ea = copy.copy(self)
+            ea.random_seed = random_seed
+            ea.game_scenario = None
+            ea.seed_eas = {}
+            self.seed_eas[random_seed] = ea
+        return self.seed_eas[random_seed]
+
+    def scenario(self):
+        """
+        Describes everything besides the genes that decides the outcome of a
+        simulation, used to key the fitness cache.
+        """
+        return {
+            'ea_units': [u.original_stats for u in self.ea_units],
+            'enemy_ucs': [[type(uc).__name__, uc.unit.original_stats]
+                          for uc in self.enemy_ucs],
+            'board_size': self.board_size,
+            'team_ordering': self.team_ordering,
+            'random_seed': self.random_seed,
+            'max_turns': self.max_turns,
+            'stalemate_turns': self.stalemate_turns
+        }
+
+    def evaluate(self, population, pool=None):
+        """
+        Simulates a game for every individual in the population and returns
+        the scores in the same order, see evaluate_seeds.
+        """
+        return self.evaluate_seeds(population,
+                                   [self.random_seed] * len(population), pool)
+
+    def evaluate_seeds(self, population, random_seeds, pool=None):
+        """
+        Simulates a game for every individual in the population with the
+        enemy unit controllers seeded by its random seed and returns the
+        scores in the same order. Scores of genes that were simulated before
+        with the same seed are taken from the fitness cache, the other
+        simulations are spread over the given process pool or Coordinator in
+        a single map, played together per seed by a BatchSimulator if batched
+        is set, or played one after another otherwise.
+        """
+        keys = [FitnessCache.key(p, self.seed_ea(seed).scenario())
+                for p, seed in zip(population, random_seeds)]
+        scores = {}
+        to_simulate = []
+        for key, p, seed in zip(keys, population, random_seeds):
+            if key in scores:
+                self.cache.hits += 1
+                continue
+            scores[key] = self.cache.get(key)
+            if scores[key] is None:
+                to_simulate.append((key, p, seed))
+        genes = [p for _, p, _ in to_simulate]
+        seeds = [seed for _, _, seed in to_simulate]
+        if pool is not None:
+            new_scores = pool.map(_worker_simulation, genes, seeds)
+        elif self.batched and genes:
+            new_scores = [None] * len(genes)
+            for seed in dict.fromkeys(seeds):
+                batch = [i for i, s in enumerate(seeds) if s == seed]
+                simulator = BatchSimulator(
+                    self.board_size, self.team_ordering, self.enemy_ucs,
+                    self.ea_units, seed, max_turns=self.max_turns,
+                    stalemate_turns=self.stalemate_turns)
+                batch_scores = simulator.simulate([genes[i] for i in batch])
+                for i, score in zip(batch, batch_scores):
+                    new_scores[i] = score
+        else:
+            new_scores = [self.seed_ea(seed).simulation(p)
+                          for p, seed in zip(genes, seeds)]
+        for (key, _, _), score in zip(to_simulate, new_scores):
+            scores[key] = score
+            self.cache.put(key, score)
+        return [scores[key] for key in keys]
+
+    def fitness(self, population, pool=None):
+        """
+        Gets the fitness of every individual in the population, by racing
+        over the racing seeds if they are set, or by a single game otherwise.
+        """
+        if self.racing_seeds:
+            return self.evaluate_racing(population, pool)
+        return self.evaluate(population, pool)
+
+    def evaluate_racing(self, population, pool=None):
+        """
+        Scores the population over the racing seeds by successive halving.
+        Every round, the remaining individuals all play the same new seeds,
+        their number doubling every round, and only the racing_keep fraction
+        with the best average score so far remains. The games of a round are
+        simulated together by evaluate_seeds. The fitness of an individual is
+        its average score, rounded, but never above the fitness of an
+        individual that remained longer. With 15 racing seeds, a population
+        of 10 and the default racing_initial and racing_keep, this plays 48
+        games instead of the 150 of playing every seed, about a third. Over a
+        run, the fitness cache saves more games, as the survivors of an epoch
+        do not play their seeds again, but how many depends on the run.
+        """
+        totals = [0] * len(population)
+        games = [0] * len(population)
+        remaining = list(range(len(population)))
+        dropped = []
+        used = 0
+        count = self.racing_initial
+        while (remaining and used < len(self.racing_seeds) and
+               (used == 0 or len(remaining) > 1)):
+            pairs = [(i, seed)
+                     for seed in self.racing_seeds[used:used + count]
+                     for i in remaining]
+            scores = self.evaluate_seeds([population[i] for i, _ in pairs],
+                                         [seed for _, seed in pairs], pool)
+            for (i, _), score in zip(pairs, scores):
+                totals[i] += score
+                games[i] += 1
+            used += count
+            count *= 2
+            remaining.sort(key=lambda i: -totals[i] / games[i])
+            keep = max(1, math.ceil(len(remaining) * self.racing_keep))
+            if used < len(self.racing_seeds):
+                dropped.append(remaining[keep:])
+                remaining = remaining[:keep]
+        fitness = [0] * len(population)
+        ceiling = math.inf
+        for group in [remaining] + dropped[::-1]:
+            for i in group:
+                fitness[i] = min(round(totals[i] / games[i]), ceiling)
+            ceiling = min([ceiling] + [fitness[i] for i in group])
+        return fitness
+
+    def ea(self, pop_size=10, epochs=100, point_mutate=0.15, workers=1,
+           coordinator=None, checkpoint=None, checkpoint_interval=1,
+           history=None, resume=False):
         """
         Apply the evolutionary algorithm, takes some optional parameters:
          - the population size (default 10)
          - the number of epochs (default 100)
          - the point mutate chance (default .15) (applies on each gene)
-        This returns the best set of genes and also the best evaluation for
-        each epoch.
+         - the number of worker processes that simulate the games (default 1,
+           which simulates in this process)
+         - a started Coordinator whose workers simulate the games instead
+           (default None)
+         - the file the run is checkpointed to (default None), without a
+           history file the epochs are also logged to the file next to it
+           with .history appended, such that the checkpoints do not grow
+           with the run
+         - the number of epochs between checkpoints (default 1)
+         - the file the scores and the best genes of every epoch are
+           appended to, instead of keeping them in memory (default None)
+         - whether to resume from the checkpoint, if it exists (default
+           False), a resumed run gives the same results as a run that was
+           not interrupted; it must use a history file if and only if the
+           checkpointed run did
+        This returns the best set of genes and also the evaluations and the
+        best set of genes for each epoch. With a history file, only those of
+        the last epoch are returned, the others are read with EpochLog.read.
+        """
+        def run(pool):
+            return self._ea(pop_size, epochs, point_mutate, pool, checkpoint,
+                            checkpoint_interval, history, resume)
+
+        if coordinator is not None:
+            return run(coordinator)
+        pool = None
+        if workers > 1:
+            pool = ProcessPoolExecutor(max_workers=workers,
+                                       initializer=_init_worker,
+                                       initargs=(self,))
+        try:
+            return run(pool)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def _ea(self, pop_size, epochs, point_mutate, pool, checkpoint=None,
+            checkpoint_interval=1, history=None, resume=False):
+        """
+        The evolutionary algorithm loop of ea, simulates on the given pool.
+        """
+        start = 0
+        best = None
+        evals = []
+        best_individuals = []
+        history_size = 0
+        log_file = history or (f'{checkpoint}.history' if checkpoint else None)
+        if resume and checkpoint and os.path.exists(checkpoint):
+            state = load_checkpoint(checkpoint)
+            if state['scenario'] != self.scenario():
+                raise ValueError(f'The checkpoint {checkpoint} was written '
+                                 f'for another scenario')
+            if state['pop_size'] != pop_size:
+                raise ValueError(f'The checkpoint {checkpoint} was written '
+                                 f'with a population size of '
+                                 f'{state["pop_size"]}, not {pop_size}')
+            if state['history'] != bool(history):
+                raise ValueError(
+                    f'The checkpoint {checkpoint} was written '
+                    f'{"with" if state["history"] else "without"} a history '
+                    f'file, it has to be resumed the same way')
+            start, population, best = (state['epoch'], state['population'],
+                                       state['best'])
+            self.random.setstate(state['random'])
+            self.generator.bit_generator.state = state['generator']
+            for uc, random_state in zip(self.enemy_ucs,
+                                        state['enemy_randoms']):
+                uc.set_random_state(random_state)
+            history_size = state['history_size']
+        else:
+            population = self.init_pop(pop_size)
+        log = EpochLog(log_file, history_size) if log_file else None
+        if log and not history:
+            evals, best_individuals = EpochLog.read(log_file)
+        try:
+            for e in range(start, epochs):
+                print('EPOCH', e)
+                self.seed_random()
+                scores = self.fitness([self.genes_dict(p)
+                                       for p in population], pool)
+                simulations = list(zip(population, scores))
+                sorted_sims = sorted(simulations, key=lambda s: -s[1])
+                best = self.genes_dict(sorted_sims[0][0])
+                if log:
+                    log.append(e, [sims[1] for sims in sorted_sims], best)
+                if not history:
+                    evals.append([sims[1] for sims in sorted_sims])
+                    best_individuals.append(best)
+                population = self.next_generation(sorted_sims, pop_size,
+                                                  point_mutate)
+                if checkpoint and ((e + 1) % checkpoint_interval == 0 or
+                                   e + 1 == epochs):
+                    save_checkpoint(checkpoint, {
+                        'scenario': self.scenario(),
+                        'pop_size': pop_size,
+                        'epoch': e + 1,
+                        'population': population,
+                        'best': best,
+                        'random': self.random.getstate(),
+                        'generator': self.generator.bit_generator.state,
+                        'enemy_randoms': [uc.get_random_state()
+                                          for uc in self.enemy_ucs],
+                        'history': bool(history),
+                        'history_size': log.size()
+                    })
+        finally:
+            if log:
+                log.close()
+        print(self.cache)
+        if history:
+            evals, best_individuals = EpochLog.read(history, last=1)
+        return best, evals, best_individuals
+
+    def next_generation(self, sorted_sims, pop_size, point_mutate):
+        """
+        Creates the next population from the (individual, score) tuples of
+        the current one, sorted from best to worst. The best half survives,
+        the rest are mutated children of weighted random parents.
+        """
+        if self.array_genomes:
+            return self.next_generation_array(sorted_sims, pop_size,
+                                              point_mutate)
+        new_pop = list(s[0] for s in sorted_sims[:pop_size // 2])
+        while len(new_pop) < pop_size:
+            p1, score = self.weighted_random(sorted_sims)
+            parents = list(sorted_sims)
+            parents.remove((p1, score))
+            p2, _ = self.weighted_random(parents)
+            c1, c2 = self.crossover(p1, p2)
+            self.mutate(c1, point_mutate)
+            self.mutate(c2, point_mutate)
+            new_pop.append(c1)
+            if len(new_pop) < pop_size:
+                new_pop.append(c2)
+        return new_pop
+
+    def next_generation_array(self, sorted_sims, pop_size, point_mutate):
+        """
+        Creates the next array encoded population like next_generation, with
+        all children crossed over and mutated at once.
+        """
+        population = np.array([s[0] for s in sorted_sims])
+        weights = np.array([s[1] for s in sorted_sims], dtype=float)
+        elite = pop_size // 2
+        pairs = (pop_size - elite + 1) // 2
+        p1 = self.weighted_random_array(weights, pairs)
+        p2 = self.weighted_random_array(weights, pairs, exclude=p1)
+        c1, c2 = self.crossover_array(population[p1], population[p2])
+        children = np.stack([c1, c2], axis=1).reshape(-1, *c1.shape[1:])
+        children = children[:pop_size - elite]
+        self.mutate_array(children, point_mutate)
+        return np.concatenate([population[:elite], children])
+
+    def island_ea(self, islands=4, pop_size=10, epochs=100, point_mutate=0.15,
+                  migration_interval=10, migrants=1, topology='ring'):
+        """
+        Apply the evolutionary algorithm on several islands at once, each
+        island is a population that evolves in its own process with its own
+        random generator, seeded from the random seed. Every
+        migration_interval epochs each island sends copies of its best
+        migrants individuals to one other island, where they replace the
+        lowest-scoring survivors of the next population. The islands only
+        wait for each other when they migrate. Takes some optional parameters:
+         - the number of islands (default 4)
+         - the population size of each island (default 10)
+         - the number of epochs (default 100)
+         - the point mutate chance (default .15) (applies on each gene)
+         - the number of epochs between migrations (default 10, 0 disables
+           migration)
+         - the number of individuals that migrate (default 1)
+         - the topology (default 'ring'), 'ring' sends to the next island,
+           'random' sends along a ring that is shuffled every migration
+        This returns the best set of genes of all islands and, per island,
+        the evaluations and the best set of genes for each epoch.
+        """
+        assert topology in ('ring', 'random')
+        assert 0 <= migrants <= pop_size // 2
+        seeds = random.Random(self.random_seed)
+        seeds = [seeds.getrandbits(32) for _ in range(islands)]
+        context = multiprocessing.get_context()
+        inboxes = [context.Queue() for _ in range(islands)]
+        results = context.Queue()
+        processes = [
+            context.Process(target=_run_island,
+                            args=(self, i, seeds[i], islands, pop_size,
+                                  epochs, point_mutate, migration_interval,
+                                  migrants, topology, inboxes, results))
+            for i in range(islands)
+        ]
+        for process in processes:
+            process.start()
+        island_results = [None] * islands
+        try:
+            for _ in range(islands):
+                island, result, *error = results.get()
+                if error:
+                    raise RuntimeError(f'Island {island} failed:\n{error[0]}')
+                island_results[island] = result
+        finally:
+            for process, result in zip(processes, island_results):
+                if result is None:
+                    process.terminate()
+                process.join()
+        evals = [r[1] for r in island_results]
+        best_individuals = [r[2] for r in island_results]
+        best = max(range(islands), key=lambda i: evals[i][-1][0])
+        return island_results[best][0], evals, best_individuals
+
+    def _migration_route(self, island, islands, topology, topology_random):
+        """
+        Gets the islands that island sends its migrants to and receives its
+        migrants from in the next migration. Every island draws the same
+        shuffles from its topology_random, so the routes agree.
+        """
+        order = list(range(islands))
+        if topology == 'random':
+            topology_random.shuffle(order)
+        position = order.index(island)
+        return order[(position + 1) % islands], order[position - 1]
+
+    def _island_ea(self, island, islands, pop_size, epochs, point_mutate,
+                   migration_interval, migrants, topology, inboxes):
+        """
+        The evolutionary algorithm loop of one island of island_ea, exchanges
+        migrants with the other islands through their inboxes.
         """
+        topology_random = random.Random(self.random_seed)
+        received = {}
         population = self.init_pop(pop_size)
         evals = []
         best_individuals = []
         for e in range(epochs):
-            print('EPOCH', e)
+            print('ISLAND', island, 'EPOCH', e)
             self.seed_random()
-            simulations = [(p, self.simulation(p)) for p in population]
+            scores = self.fitness([self.genes_dict(p) for p in population])
+            simulations = list(zip(population, scores))
             sorted_sims = sorted(simulations, key=lambda s: -s[1])
             evals.append([sims[1] for sims in sorted_sims])
-            best_individuals.append(sorted_sims[0][0])
-            new_pop = list(s[0] for s in sorted_sims[:pop_size // 2])
-            while len(new_pop) < pop_size:
-                p1, score = self.weighted_random(sorted_sims)
-                parents = list(sorted_sims)
-                parents.remove((p1, score))
-                p2, _ = self.weighted_random(parents)
-                c1, c2 = self.crossover(p1, p2)
-                self.mutate(c1, point_mutate)
-                self.mutate(c2, point_mutate)
-                new_pop.append(c1)
-                if len(new_pop) < pop_size:
-                    new_pop.append(c2)
-            population = new_pop
-        return sorted_sims[0][0], evals, best_individuals
+            best_individuals.append(self.genes_dict(sorted_sims[0][0]))
+            population = self.next_generation(sorted_sims, pop_size,
+                                              point_mutate)
+            if (migration_interval and islands > 1 and migrants and
+                    (e + 1) % migration_interval == 0 and e + 1 < epochs):
+                target, source = self._migration_route(
+                    island, islands, topology, topology_random)
+                inboxes[target].put(
+                    (e, island, [s[0] for s in sorted_sims[:migrants]]))
+                while (e, source) not in received:
+                    epoch, sender, individuals = inboxes[island].get()
+                    received[(epoch, sender)] = individuals
+                # The survivors come first in the population, best to worst,
+                # the migrants replace the lowest-scoring ones.
+                survivors = pop_size // 2
+                population[survivors - migrants:survivors] = received.pop(
+                    (e, source))
+        print(self.cache)
+        return best_individuals[-1], evals, best_individuals
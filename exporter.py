@@ -8,18 +8,6 @@ class AsciiExporter:
     be shown in both command line and in file output.
     """
 
-    @staticmethod
-    def _get_unit_dict(units):
-        """
-        Creates a dictionary of Units on the playing field by position and id.
-        :param units: Units on the playing field.
-        :return: A dictionary of Units with position and an id.
-        """
-        res = dict()
-        for unit in units:
-            res[(unit.x, unit.y)] = unit
-        return res
-
     @staticmethod
     def _create_color_dict(state):
         """
@@ -32,7 +20,68 @@ class AsciiExporter:
         return {t: c for t, c in zip(teams, colors)}
 
     @staticmethod
-    def export(state, file_name=None):
+    def _window(state, viewport, padding):
+        """
+        Determines the part of the board to render.
+        :param state: The State object of the game.
+        :param viewport: None for the whole board, 'units' for the bounding
+                         box of the living Units, or a window (x0, y0, x1, y1)
+                         with exclusive ends.
+        :param padding: The number of cells added around the viewport.
+        :return: A window (x0, y0, x1, y1) clipped to the board.
+        """
+        width, height = state.board_dimensions
+        if viewport is None:
+            return 0, 0, width, height
+        if viewport == 'units':
+            units = state.units
+            if not units:
+                return 0, 0, 0, 0
+            viewport = (min(u.x for u in units), min(u.y for u in units),
+                        max(u.x for u in units) + 1,
+                        max(u.y for u in units) + 1)
+        x0, y0, x1, y1 = viewport
+        return (max(0, x0 - padding), max(0, y0 - padding),
+                min(width, x1 + padding), min(height, y1 + padding))
+
+    @staticmethod
+    def _lines(state, colored, viewport=None, padding=0):
+        """
+        Generates the lines of the output of a State one by one, only for the
+        cells within the viewport.
+        :param state: The State of which the output is generated.
+        :param colored: Whether the Units are colored by team.
+        :param viewport: The part of the board to render, see _window.
+        :param padding: The number of cells added around the viewport.
+        :return: A generator of strings, one per line of output.
+        """
+        x0, y0, x1, y1 = AsciiExporter._window(state, viewport, padding)
+        colors = AsciiExporter._create_color_dict(state)
+        units = [u for u in state.units
+                 if x0 <= u.x < x1 and y0 <= u.y < y1]
+        rows = {}
+        for unit in units:
+            rows.setdefault(unit.y, []).append(unit)
+        if viewport is not None:
+            yield f'x: {x0}-{x1 - 1}, y: {y0}-{y1 - 1}'
+        grid_line = '+---' * (x1 - x0) + '+'
+        yield grid_line
+        empty_row = ['|   '] * (x1 - x0) + ['|']
+        for y in range(y0, y1):
+            row = empty_row
+            if y in rows:
+                row = list(empty_row)
+                for unit in rows[y]:
+                    id_str = AsciiExporter._pad_to_three(unit.id)
+                    if colored:
+                        id_str = f'{colors[unit.team]}{id_str}{Fore.RESET}'
+                    row[unit.x - x0] = f'|{id_str}'
+            yield ''.join(row)
+            yield grid_line
+        yield '\n' + AsciiExporter._legend(units, colors if colored else None)
+
+    @staticmethod
+    def export(state, file_name=None, viewport=None, padding=0):
         """
         Exports the output of a State to either the command line or an output
         file if one is given.
@@ -40,35 +89,36 @@ class AsciiExporter:
         :param file_name: Name of the file to which the output should be
                           written. Output is written to command line if
                           no file name is given.
-        :return: A list of strings that comprise the output of a State.
+        :param viewport: The part of the board to render: None for the whole
+                         board, 'units' for the bounding box of the living
+                         Units, or a window (x0, y0, x1, y1) with exclusive
+                         ends.
+        :param padding: The number of cells added around the viewport.
+        :return: A string that comprises the output of a State.
         """
-        grid_line = '+---' * state.board_dimensions[0] + '+'
-        result = [grid_line]
-        unit_dict = AsciiExporter._get_unit_dict(state.units)
-        colors = AsciiExporter._create_color_dict(state)
-        for y in range(state.board_dimensions[1]):
-            temp = ''
-            for x in range(state.board_dimensions[0]):
-                if (x, y) in unit_dict:
-                    unit = unit_dict[(x, y)]
-                    id_str = AsciiExporter._pad_to_three(unit.id)
-                    if file_name:
-                        temp += f'|{id_str}'
-                    else:
-                        temp += f'|{colors[unit.team]}{id_str}{Fore.RESET}'
-                else:
-                    temp += '|   '
-            result.append(temp + '|')
-            result.append(grid_line)
-        if file_name:
-            result.append('\n' + AsciiExporter._legend(state.units))
-        else:
-            result.append('\n' + AsciiExporter._legend(state.units, colors))
-        result = '\n'.join(result)
+        result = '\n'.join(AsciiExporter._lines(state, not file_name,
+                                                viewport, padding))
         if file_name:
             AsciiExporter._export_to_file(file_name, result)
         return result
 
+    @staticmethod
+    def stream(state, file_name, viewport=None, padding=0):
+        """
+        Writes the output of a State to a file line by line, without building
+        the whole output in memory first.
+        :param state: The State of which the output it to be exported.
+        :param file_name: Name of the file to which the output is written.
+        :param viewport: The part of the board to render, see export.
+        :param padding: The number of cells added around the viewport.
+        """
+        with open(file_name, 'w') as f:
+            for i, line in enumerate(AsciiExporter._lines(state, False,
+                                                          viewport, padding)):
+                if i:
+                    f.write('\n')
+                f.write(line)
+
     @staticmethod
     def _legend(units, color_dict=None):
         """
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from hashlib import sha1
+from json import dumps
+
+
+class FitnessCache:
+    """
+    Creates a FitnessCache object. The FitnessCache is a bounded least
+    recently used cache that maps a set of genes in a scenario to the score it
+    got in a simulation, so deterministic games do not have to be replayed.
+    """
+
+    def __init__(self, max_size=1024):
+        """
+        Initializes a FitnessCache object.
+        :param max_size: The maximum number of scores to keep, the least
+                         recently used score is dropped when it is exceeded.
+        """
+        self.max_size = max_size
+        self.scores = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(genes, scenario):
+        """
+        Creates a canonical hash for a set of genes in a scenario.
+        :param genes: The genes of an individual.
+        :param scenario: A JSON serializable description of the scenario.
+        :return: A hex digest that is equal for equal genes and scenarios.
+        """
+        return sha1(dumps([genes, scenario], sort_keys=True).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Gets the score stored for key and counts the hit or miss.
+        :param key: The key created by FitnessCache.key.
+        :return: The stored score if there is one, None otherwise.
+        """
+        if key in self.scores:
+            self.hits += 1
+            self.scores.move_to_end(key)
+            return self.scores[key]
+        self.misses += 1
+
+    def put(self, key, score):
+        """
+        Stores the score for key, dropping the least recently used score if
+        the cache is full.
+        :param key: The key created by FitnessCache.key.
+        :param score: The score of the simulation.
+        """
+        if self.max_size <= 0:
+            return
+        self.scores[key] = score
+        self.scores.move_to_end(key)
+        while len(self.scores) > self.max_size:
+            self.scores.popitem(last=False)
+
+    def __str__(self):
+        """
+        Creates a string with the hit and miss counts of the cache.
+        :return: A string object for the FitnessCache class.
+        """
+        return f'<FitnessCache {self.hits} hits, {self.misses} misses,' + \
+               f' {len(self.scores)}/{self.max_size} scores>'
@@ -0,0 +1,170 @@
+import time
+from collections import defaultdict
+
+
+class TimedMethod:
+    """
+    Wraps a method such that its calls are counted and timed under a phase of
+    an Instrumentation, and under the UnitController class if one is given.
+    The wrappers are objects instead of closures, such that an instrumented
+    game can be pickled, for example for the workers of a spawn process pool.
+    A call made while the same phase is already being timed, like the
+    next_movement that approach_movement calls by default, is not measured
+    again.
+    """
+
+    def __init__(self, instrumentation, phase, method, controller_class=None):
+        self.instrumentation = instrumentation
+        self.phase = phase
+        self.function = method.__func__
+        self.owner = method.__self__
+        self.controller_class = controller_class
+
+    def __call__(self, *args, **kwargs):
+        instrumentation = self.instrumentation
+        if self.phase in instrumentation.timing:
+            return self.function(self.owner, *args, **kwargs)
+        instrumentation.timing.add(self.phase)
+        start = time.perf_counter()
+        try:
+            return self.function(self.owner, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            instrumentation.timing.discard(self.phase)
+            instrumentation.seconds[self.phase] += elapsed
+            instrumentation.calls[self.phase] += 1
+            if self.controller_class:
+                instrumentation.controller_seconds[
+                    self.controller_class, self.phase] += elapsed
+
+
+class CountedMethod:
+    """
+    Wraps a method such that its calls are counted under its name by an
+    Instrumentation, see TimedMethod.
+    """
+
+    def __init__(self, instrumentation, name, method):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.function = method.__func__
+        self.owner = method.__self__
+
+    def __call__(self, *args, **kwargs):
+        self.instrumentation.calls[self.name] += 1
+        return self.function(self.owner, *args, **kwargs)
+
+
+class Instrumentation:
+    """
+    Creates an Instrumentation object. An Instrumentation measures where the
+    time of the games of a StateController goes. When it is attached, the
+    methods of each game phase are wrapped on the StateController, its State
+    and its UnitControllers to time them per phase and per UnitController
+    class, and the hot methods are wrapped to count their calls. Nothing is
+    wrapped when no Instrumentation is used, so it costs nothing then. An
+    Instrumentation can be pickled with the games it is attached to, but the
+    games a copy measures in another process are not added to this one.
+    """
+
+    # Game phases, with the object and a method that implements them.
+    phases = [
+        ('turn_ordering', 'state_controller', 'get_turn_ordering'),
+        ('decide_movement', 'unit_controller', 'next_movement'),
+        ('decide_movement', 'unit_controller', 'approach_movement'),
+        ('apply_movement', 'state', 'simulate_move'),
+        ('decide_attack', 'unit_controller', 'next_attack'),
+        ('apply_attack', 'state', 'simulate_attack'),
+        ('game_finished', 'state', 'game_finished'),
+    ]
+
+    # Methods of which only the calls are counted.
+    counted = [
+        ('unit_controller', 'possible_moves'),
+        ('state', 'movement_allowed'),
+        ('state', 'attack_allowed'),
+    ]
+
+    def __init__(self):
+        """
+        Initializes an Instrumentation object without any measurements.
+        """
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.controller_seconds = defaultdict(float)
+        self.turns = []
+        self.timing = set()
+
+    @staticmethod
+    def _wrap(objects, targets, wrapper):
+        """
+        Replaces the methods named in the given (kind, method name) tuples on
+        the objects of each kind by wrapper(name, method, controller class).
+        """
+        for kind, name in targets:
+            for obj in objects[kind]:
+                controller_class = None
+                if kind == 'unit_controller':
+                    controller_class = type(obj).__name__
+                setattr(obj, name,
+                        wrapper(name, getattr(obj, name), controller_class))
+
+    def attach(self, state_controller):
+        """
+        Wraps the phase methods and the counted methods of state_controller,
+        its State and its UnitControllers. Attaching again does nothing.
+        :param state_controller: The StateController to measure.
+        """
+        wrapper = vars(state_controller).get('get_turn_ordering')
+        if (isinstance(wrapper, TimedMethod) and
+                wrapper.instrumentation is self):
+            return
+        objects = {
+            'state_controller': [state_controller],
+            'state': [state_controller.state],
+            'unit_controller': state_controller.unit_controllers
+        }
+        self._wrap(objects, [(kind, name) for _, kind, name in self.phases],
+                   lambda name, method, cls: TimedMethod(
+                       self, self._phase_of(name), method, cls))
+        self._wrap(objects, self.counted,
+                   lambda name, method, cls: CountedMethod(self, name,
+                                                           method))
+
+    def _phase_of(self, method_name):
+        """
+        Gets the phase that is implemented by the method method_name.
+        """
+        return next(p for p, _, name in self.phases if name == method_name)
+
+    def game_complete(self, turns):
+        """
+        Records the number of turns of a finished game.
+        :param turns: The number of turns the game took.
+        """
+        self.turns.append(turns)
+
+    def report(self):
+        """
+        Creates a structured report of the measurements.
+        :return: A dictionary with the seconds and calls per phase, the
+                 seconds per phase per UnitController class, the call counts
+                 of the counted methods and the number of turns per game.
+        """
+        controllers = defaultdict(dict)
+        for (cls, phase), seconds in self.controller_seconds.items():
+            controllers[cls][phase] = seconds
+        return {
+            'phases': {
+                phase: {'seconds': self.seconds[phase],
+                        'calls': self.calls[phase]}
+                for phase, _, _ in self.phases
+            },
+            'controllers': dict(controllers),
+            'calls': dict(
+                [(name, self.calls[name]) for _, name in self.counted] +
+                [('game_finished', self.calls['game_finished'])]
+            ),
+            'games': len(self.turns),
+            'turns': list(self.turns),
+        }
@@ -1,10 +1,11 @@
 from unit import Unit
 from unitcontrollers import AIUnitController
 from evolutionaryalgorithm import EvoluationaryAlgorithm
-import matplotlib.pyplot as plt
-import numpy as np
 import os
-from json import dumps
+import argparse
+from json import dumps, loads
+from sweep import sweep, run_name
+from report import write_scores, report
 
 
 c1 = Unit((100, 4), {'hp': 30, 'atk': 4, 'range': 1, 'move': 3}, team='Chaos', name='A')
@@ -43,72 +44,90 @@ oc9 = AIUnitController(o9, state=None)
 oc10 = AIUnitController(o10, state=None)
 
 
+# The Units of both armies, an army of size n consists of the first n.
+chaos_units = [c1, c2, c3, c4, c5, c6, c7, c8, c9, c10]
+order_ucs = [oc1, oc2, oc3, oc4, oc5, oc6, oc7, oc8, oc9, oc10]
+
+# The experiment grid, every combination of these values is run.
+GRID = {
+    'army_size': [6, 8, 10],
+    'pop_size': [10, 20],
+    'point_mutate': [0.20, 0.40]
+}
+
+
+def experiment_name(config):
+    """
+    Names the results directory of a configuration of GRID. Every parameter
+    besides the army size, point mutate and population size, such as the
+    number of epochs, is appended as in run_name, so configurations that
+    differ in any parameter get their own directory.
+    """
+    army_size = config['army_size']
+    name = (f'{army_size}_vs_{army_size}_PM_{config["point_mutate"]}_'
+            f'PS_{config["pop_size"]}')
+    others = {key: value for key, value in config.items()
+              if key not in ('army_size', 'point_mutate', 'pop_size')}
+    if others:
+        name += '_' + run_name(others)
+    return name
+
+
+def experiment_title(config):
+    """
+    Titles the figure of a configuration of GRID.
+    """
+    army_size = config['army_size']
+    return (f'Performance for: #units: {army_size} vs {army_size},\n'
+            f'point mutate: {config["point_mutate"]}, '
+            f'population size: {config["pop_size"]}')
+
+
+def experiment(directory, army_size, pop_size, point_mutate, epochs=30):
+    """
+    Runs the evolutionary algorithm for army_size Units against army_size
+    enemies, writes the scores of every epoch to scores.csv and the best
+    genes to genes.json in directory. The figures are rendered afterwards by
+    the report stage.
+    :return: The best score of the last epoch.
+    """
+    ea = EvoluationaryAlgorithm(
+        board_size=(500, 500),
+        ea_units=chaos_units[:army_size],
+        enemy_ucs=order_ucs[:army_size],
+        team_ordering=['Order', 'Chaos'],
+        random_seed=2112
+    )
+    best_genes, scores, individuals = ea.ea(pop_size=pop_size,
+                                            epochs=epochs,
+                                            point_mutate=point_mutate)
+
+    write_scores(os.path.join(directory, 'scores.csv'), scores)
+    with open(os.path.join(directory, 'genes.json'), 'w') as f:
+        f.write(dumps(best_genes, indent=2))
+    return {'best_score': scores[-1][0]}
+
+
 if __name__ == '__main__':
-    epochs = 30
-
-    ea_units_testing = [
-        [c1, c2, c3, c4, c5, c6],
-        [c1, c2, c3, c4, c5, c6, c7, c8],
-        [c1, c2, c3, c4, c5, c6, c7, c8, c9, c10]
-    ]
-
-    enemy_ucs_testing = [
-        [oc1, oc2, oc3, oc4, oc5, oc6],
-        [oc1, oc2, oc3, oc4, oc5, oc6, oc7, oc8],
-        [oc1, oc2, oc3, oc4, oc5, oc6, oc7, oc8, oc9, oc10]
-    ]
-    
-    pop_sizes = [10, 20]
-    point_mutates = [0.20, 0.40]
-
-    SAVE_DIR = os.path.join(os.getcwd(), 'results')
-
-    # begin of tests
-    for ea_units, enemy_ucs in zip(ea_units_testing, enemy_ucs_testing):
-        for pop_size in pop_sizes:
-            for point_mutate in point_mutates:
-                ea = EvoluationaryAlgorithm(
-                    board_size=(500, 500),
-                    ea_units=ea_units,
-                    enemy_ucs=enemy_ucs,
-                    team_ordering=['Order', 'Chaos'],
-                    random_seed=2112
-                )
-                best_genes, scores, individuals = ea.ea(pop_size=pop_size,
-                                                        epochs=epochs,
-                                                        point_mutate=point_mutate)
-
-                best_scores = [indvs[0] for indvs in scores]
-                not_the_best_scores = [indvs[1:] for indvs in scores]
-                
-                medians = np.median(scores, axis=1)
-                means = np.mean(scores, axis=1)
-
-                all_epochs = list(range(epochs))
-
-                plt.clf()
-                plt.plot(all_epochs, best_scores, label='Best scores')
-
-                for srs, e in zip(not_the_best_scores, all_epochs):
-                    for sc in srs:
-                        plt.plot(e, sc, 'gx')
-                
-                plt.plot([], [], 'gx', label='Individual scores')
-
-                plt.plot(all_epochs, medians, '--', label='Median scores')
-                plt.plot(all_epochs, means, '.-.', label='Average scores')
-                
-                plt.legend(loc='best')
-
-                plt.xlabel('Epoch')
-                plt.ylabel('Score')
-                plt.title(f'Performance for: #units: {len(ea_units)} vs {len(enemy_ucs)},\npoint mutate: {point_mutate}, population size: {pop_size}')
-
-                sub_pth = f'{len(ea_units)}_vs_{len(enemy_ucs)}_PM_{point_mutate}_PS_{pop_size}'
-                pth = os.path.join(SAVE_DIR, sub_pth)
-                os.mkdir(pth)
-                image_pth = os.path.join(pth, 'result.png')
-                plt.savefig(image_pth)
-                genes_pth = os.path.join(pth, 'genes.json')
-                with open(genes_pth, 'w') as f:
-                    f.write(dumps(best_genes, indent=2))
+    parser = argparse.ArgumentParser(
+        description='Runs the experiment grid, skipping finished runs.'
+    )
+    parser.add_argument('--grid', help='a JSON file that replaces values '
+                                       'of the grid')
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--save-dir',
+                        default=os.path.join(os.getcwd(), 'results'))
+    parser.add_argument('--skip-report', action='store_true',
+                        help='only run the experiments, render the figures '
+                             'later with report.py')
+    args = parser.parse_args()
+
+    grid = dict(GRID, epochs=[args.epochs])
+    if args.grid:
+        with open(args.grid) as f:
+            grid.update(loads(f.read()))
+    sweep(experiment, grid, args.save_dir, name=experiment_name,
+          workers=args.workers)
+    if not args.skip_report:
+        report(args.save_dir, title=experiment_title)
@@ -0,0 +1,246 @@
+import mmap
+import struct
+from state import State
+from unit import Unit
+
+MAGIC = b'FERP'
+VERSION = 1
+HEADER = struct.Struct('<4sHII')  # magic, version, board width and height
+COUNT = struct.Struct('<I')
+STRING = struct.Struct('<H')
+# id, x, y, hp, max_hp, atk, range, move, team string, name string
+ROSTER = struct.Struct('<IiiiiiiiII')
+# kind, unit, x or attacked unit or turn, y or hp left
+EVENT = struct.Struct('<BIii')
+# number of turns, offset of the turn index
+FOOTER = struct.Struct('<IQ4s')
+TURN_OFFSET = struct.Struct('<Q')
+
+MOVE, ATTACK, TURN = 1, 2, 3
+
+
+def chain_callbacks(previous, callback):
+    """
+    Combines two callbacks into one that calls previous, if it is set, and
+    then callback with the same arguments.
+    """
+    if previous is None:
+        return callback
+
+    def both(*args):
+        previous(*args)
+        callback(*args)
+    return both
+
+
+class ReplayRecorder:
+    """
+    Creates a ReplayRecorder object. The ReplayRecorder writes a game to a
+    compact binary replay: the initial roster, followed by one fixed-width
+    record per move, attack and completed turn. When it is closed, an index of
+    the turns is appended so a ReplayReader can jump to any turn.
+    """
+
+    def __init__(self, file_name):
+        """
+        Initializes a ReplayRecorder that writes to the given file.
+        :param file_name: Name of the file the replay is written to.
+        """
+        self.file = open(file_name, 'wb')
+        self.unit_index = {}
+        self.turn_offsets = []
+        self.state_controller = None
+        self.previous_callbacks = None
+
+    def attach(self, state_controller):
+        """
+        Writes the roster of the State of state_controller and chains the
+        recording to the callbacks of state_controller, such that callbacks
+        that were set before, like another recorder, are still called. The
+        UnitControllers must have been added already.
+        :param state_controller: The StateController whose game is recorded.
+        """
+        state = state_controller.state
+        units = state.units
+        strings = []
+        for u in units:
+            for s in (u.team, u.name):
+                if s not in strings:
+                    strings.append(s)
+        self.file.write(HEADER.pack(MAGIC, VERSION, *state.board_dimensions))
+        self.file.write(COUNT.pack(len(strings)))
+        for s in strings:
+            encoded = str(s).encode()
+            self.file.write(STRING.pack(len(encoded)) + encoded)
+        self.file.write(COUNT.pack(len(units)))
+        for i, u in enumerate(units):
+            self.unit_index[u.id] = i
+            self.file.write(ROSTER.pack(
+                u.id, u.x, u.y, u.hp, u.max_hp, u.atk, u.range, u.move,
+                strings.index(u.team), strings.index(u.name)
+            ))
+        self.state_controller = state_controller
+        self.previous_callbacks = (state_controller.move_callback,
+                                   state_controller.attack_callback,
+                                   state_controller.turn_complete_callback)
+        state_controller.move_callback = chain_callbacks(
+            state_controller.move_callback, self.record_move)
+        state_controller.attack_callback = chain_callbacks(
+            state_controller.attack_callback, self.record_attack)
+        state_controller.turn_complete_callback = chain_callbacks(
+            state_controller.turn_complete_callback, self.record_turn)
+
+    def record_move(self, unit, new_position):
+        """
+        Records the move of unit to new_position.
+        """
+        self.file.write(EVENT.pack(MOVE, self.unit_index[unit.id],
+                                   *new_position))
+
+    def record_attack(self, unit, attacked_unit):
+        """
+        Records the attack of unit on attacked_unit.
+        """
+        self.file.write(EVENT.pack(ATTACK, self.unit_index[unit.id],
+                                   self.unit_index[attacked_unit.id],
+                                   attacked_unit.hp))
+
+    def record_turn(self, turn, state):
+        """
+        Records the end of a turn, can be used as turn_complete_callback.
+        """
+        self.turn_offsets.append(self.file.tell())
+        self.file.write(EVENT.pack(TURN, 0, turn, 0))
+
+    def close(self):
+        """
+        Writes the turn index and closes the replay file. The StateController
+        it is attached to gets its previous callbacks back.
+        """
+        if self.state_controller is not None:
+            (self.state_controller.move_callback,
+             self.state_controller.attack_callback,
+             self.state_controller.turn_complete_callback) = \
+                self.previous_callbacks
+            self.state_controller = None
+        index_offset = self.file.tell()
+        for offset in self.turn_offsets:
+            self.file.write(TURN_OFFSET.pack(offset))
+        self.file.write(FOOTER.pack(len(self.turn_offsets), index_offset,
+                                    MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReplayReader:
+    """
+    Creates a ReplayReader object. The ReplayReader memory-maps a replay
+    written by a ReplayRecorder and can rebuild the State at any turn.
+    """
+
+    def __init__(self, file_name):
+        """
+        Opens and memory-maps the replay, and reads its roster and turn index.
+        :param file_name: Name of the replay file.
+        """
+        with open(file_name, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, width, height = HEADER.unpack_from(self.data, 0)
+        assert magic == MAGIC and version == VERSION
+        self.board_dimensions = (width, height)
+        offset = HEADER.size
+        strings = []
+        (n_strings,) = COUNT.unpack_from(self.data, offset)
+        offset += COUNT.size
+        for _ in range(n_strings):
+            (length,) = STRING.unpack_from(self.data, offset)
+            offset += STRING.size
+            strings.append(self.data[offset:offset + length].decode())
+            offset += length
+        (n_units,) = COUNT.unpack_from(self.data, offset)
+        offset += COUNT.size
+        self.roster = []
+        for _ in range(n_units):
+            self.roster.append(ROSTER.unpack_from(self.data, offset))
+            offset += ROSTER.size
+        self.strings = strings
+        self.events_offset = offset
+        self.turn_offsets = self._read_turn_index()
+
+    def _read_turn_index(self):
+        """
+        Reads the turn index from the footer, or scans the events if the
+        replay was not closed properly.
+        :return: A list with the offset of the record that ends each turn.
+        """
+        end = len(self.data) - FOOTER.size
+        if end >= self.events_offset:
+            n_turns, index_offset, magic = FOOTER.unpack_from(self.data, end)
+            if magic == MAGIC:
+                return [TURN_OFFSET.unpack_from(
+                            self.data, index_offset + i * TURN_OFFSET.size)[0]
+                        for i in range(n_turns)]
+        offsets = []
+        offset = self.events_offset
+        while offset + EVENT.size <= len(self.data):
+            if EVENT.unpack_from(self.data, offset)[0] == TURN:
+                offsets.append(offset)
+            offset += EVENT.size
+        return offsets
+
+    def __len__(self):
+        """
+        Gets the number of completed turns in the replay.
+        """
+        return len(self.turn_offsets)
+
+    def events(self, turn):
+        """
+        Gets the move and attack records of a turn.
+        :param turn: The turn, starting at 1.
+        :return: A list of (kind, unit index, a, b) tuples.
+        """
+        start = self.events_offset if turn == 1 else \
+            self.turn_offsets[turn - 2] + EVENT.size
+        return [EVENT.unpack_from(self.data, offset)
+                for offset in range(start, self.turn_offsets[turn - 1],
+                                    EVENT.size)]
+
+    def state_at(self, turn):
+        """
+        Rebuilds the State at the end of a turn by replaying the records up to
+        it on the initial roster.
+        :param turn: The turn, 0 for the initial State.
+        :return: The State after turn.
+        """
+        state = State(self.board_dimensions)
+        units = []
+        for (unit_id, x, y, hp, max_hp, atk, rng, move, team,
+             name) in self.roster:
+            unit = Unit((x, y), {'hp': max_hp, 'atk': atk, 'range': rng,
+                                 'move': move},
+                        team=self.strings[team], name=self.strings[name])
+            unit.id = unit_id
+            unit.hp = hp
+            units.append(unit)
+            state.add_unit(unit)
+        state.original_units = list(units)
+        end = self.turn_offsets[turn - 1] if turn else self.events_offset
+        for offset in range(self.events_offset, end, EVENT.size):
+            kind, unit, a, b = EVENT.unpack_from(self.data, offset)
+            if kind == MOVE:
+                state.simulate_move(units[unit], (a, b))
+            elif kind == ATTACK:
+                state.simulate_attack(units[unit], units[a])
+        return state
+
+    def close(self):
+        """
+        Closes the memory map of the replay.
+        """
+        self.data.close()
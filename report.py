@@ -0,0 +1,102 @@
+import argparse
+import csv
+import json
+import os
+
+
+def write_scores(file_name, scores):
+    """
+    Writes the score history of a run to a CSV file, a row per epoch.
+    :param file_name: The name of the CSV file.
+    :param scores: The sorted scores of the population of every epoch.
+    """
+    with open(file_name, 'w', newline='') as f:
+        csv.writer(f).writerows(scores)
+
+
+def read_scores(file_name):
+    """
+    Reads a score history that was written by write_scores.
+    :param file_name: The name of the CSV file.
+    :return: A list with the scores of every epoch.
+    """
+    with open(file_name, newline='') as f:
+        return [[float(score) for score in row] for row in csv.reader(f)]
+
+
+def plot_scores(scores, title, file_name):
+    """
+    Plots the best, median and average score of every epoch and the scores
+    of all other individuals, which are drawn by a single scatter call.
+    matplotlib is imported here, so only the report stage needs it.
+    :param scores: The sorted scores of the population of every epoch.
+    :param title: The title of the figure.
+    :param file_name: The name of the image file.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    scores = np.array(scores)
+    all_epochs = np.arange(len(scores))
+    others = scores[:, 1:]
+
+    fig, ax = plt.subplots()
+    ax.plot(all_epochs, scores[:, 0], label='Best scores')
+    ax.scatter(np.repeat(all_epochs, others.shape[1]), others.ravel(),
+               marker='x', color='g', label='Individual scores')
+    ax.plot(all_epochs, np.median(scores, axis=1), '--',
+            label='Median scores')
+    ax.plot(all_epochs, np.mean(scores, axis=1), '.-.',
+            label='Average scores')
+    ax.legend(loc='best')
+    ax.set_xlabel('Epoch')
+    ax.set_ylabel('Score')
+    ax.set_title(title)
+    fig.savefig(file_name)
+    plt.close(fig)
+
+
+def default_title(config):
+    """
+    Titles the figure of a run after its configuration.
+    """
+    return ', '.join(f'{key}: {value}' for key, value in config.items())
+
+
+def report(save_dir, title=default_title, force=False):
+    """
+    Renders the result.png of every run in the index.json of a sweep from
+    its scores.csv. Runs that already have a result.png are skipped unless
+    force is set.
+    :param save_dir: The directory of the sweep.
+    :param title: A function that titles the figure of a configuration.
+    :param force: Whether to render existing figures again.
+    :return: The directories of the runs that were rendered.
+    """
+    with open(os.path.join(save_dir, 'index.json')) as f:
+        index = json.loads(f.read())
+    rendered = []
+    for entry in index:
+        directory = entry['directory']
+        scores_file = os.path.join(directory, 'scores.csv')
+        image_file = os.path.join(directory, 'result.png')
+        if not os.path.exists(scores_file):
+            continue
+        if os.path.exists(image_file) and not force:
+            continue
+        plot_scores(read_scores(scores_file), title(entry['config']),
+                    image_file)
+        rendered.append(directory)
+    return rendered
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Renders the figures of the runs of a sweep.'
+    )
+    parser.add_argument('save_dir')
+    parser.add_argument('--force', action='store_true')
+    args = parser.parse_args()
+    report(args.save_dir, force=args.force)
@@ -0,0 +1,91 @@
+import copy
+from replay import ReplayRecorder
+from statecontroller import StateController
+from unitcontrollers import GeneUnitController
+
+
+class Scenario:
+    """
+    Creates a Scenario object. A Scenario sets up the board, the Units and the
+    UnitControllers of a game once and takes a snapshot of the initial State.
+    Every game it restores that snapshot in place and only swaps the genes of
+    the GeneUnitControllers, instead of building a new game.
+    """
+
+    def __init__(self, board_size, team_ordering, enemy_ucs, ea_units,
+                 random_seed, threat_map=False, array_state=False,
+                 vectorized=False, instrumentation=None, max_turns=None,
+                 stalemate_turns=None, fast_forward=False,
+                 occupancy_grid=False):
+        """
+        Initializes a Scenario object.
+        :param board_size: The x- and y-dimensions of the playing board.
+        :param team_ordering: The turn order of the teams on the playing board.
+        :param enemy_ucs: The enemy UnitControllers, the Scenario plays with
+                          copies of them so they are not changed.
+        :param ea_units: The Units that are controlled by genes.
+        :param random_seed: The random seed of the enemy UnitControllers at
+                            the start of every game.
+        :param threat_map: Whether the State keeps a threat map.
+        :param array_state: Whether the State is an ArrayState.
+        :param vectorized: Whether the GeneUnitControllers score their moves
+                           with NumPy.
+        :param instrumentation: An Instrumentation that measures the phases
+                                of the games, if any.
+        :param max_turns: The number of turns after which a game ends, if
+                          any.
+        :param stalemate_turns: The number of turns without progress after
+                                which a game ends, if any.
+        :param fast_forward: Whether approach turns are played with the
+                             cheaper approach_movement.
+        :param occupancy_grid: Whether the State keeps an occupancy grid.
+        """
+        self.random_seed = random_seed
+        self.ea_units = ea_units
+        self.state_controller = StateController(board_size, team_ordering,
+                                                threat_map=threat_map,
+                                                array_state=array_state,
+                                                instrumentation=instrumentation,
+                                                max_turns=max_turns,
+                                                stalemate_turns=stalemate_turns,
+                                                fast_forward=fast_forward,
+                                                occupancy_grid=occupancy_grid)
+        state = self.state_controller.state
+        self.enemy_ucs = []
+        for uc in enemy_ucs:
+            uc = copy.deepcopy(uc, {id(uc.state): None})
+            uc.reset_unit()
+            uc.state = state
+            self.enemy_ucs.append(uc)
+        no_genes = {g: 0 for g in GeneUnitController.gene_names}
+        self.gene_ucs = [
+            GeneUnitController(u.clone_original(), state, no_genes,
+                               vectorized=vectorized)
+            for u in ea_units
+        ]
+        self.state_controller.add_unit_controllers(self.enemy_ucs +
+                                                   self.gene_ucs)
+        self.initial_state = state.snapshot()
+
+    def play(self, genes, replay_file=None):
+        """
+        Restores the initial State, plays a game with the given genes and
+        returns the score for the team of the gene Units.
+        :param genes: The genes per name of the gene Units.
+        :param replay_file: The file the game is recorded to by a
+                            ReplayRecorder, if any.
+        :return: The score of the game, see State.evaluate_game.
+        """
+        state = self.state_controller.state
+        state.restore(self.initial_state)
+        for uc in self.enemy_ucs:
+            uc.seed_random(self.random_seed)
+        for uc, u in zip(self.gene_ucs, self.ea_units):
+            uc.set_genes(genes[u.name])
+        if replay_file is None:
+            self.state_controller.process_game()
+        else:
+            with ReplayRecorder(replay_file) as recorder:
+                recorder.attach(self.state_controller)
+                self.state_controller.process_game()
+        return state.evaluate_game(self.ea_units[0].team)
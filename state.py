@@ -1,32 +1,261 @@
+import numpy as np
 from collections import defaultdict
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def diamond(radius):
+    """
+    Creates the offsets of all cells within Manhattan distance radius of a
+    cell, ordered by x-offset and then by y-offset. Computed once per radius.
+    :param radius: The radius of the diamond.
+    :return: A tuple of (dx, dy) offsets.
+    """
+    return tuple((dx, dy) for dx in range(-radius, radius + 1)
+                 for dy in range(-(radius - abs(dx)), radius - abs(dx) + 1))
+
+
+@lru_cache(maxsize=None)
+def diamond_array(radius):
+    """
+    Creates the offsets of diamond(radius) as a read-only NumPy array.
+    :param radius: The radius of the diamond.
+    :return: A K x 2 array of (dx, dy) offsets.
+    """
+    offsets = np.array(diamond(radius), dtype=np.int64).reshape(-1, 2)
+    offsets.flags.writeable = False
+    return offsets
+
+
+@lru_cache(maxsize=None)
+def diamond_flat(radius, height):
+    """
+    Creates the offsets of diamond(radius) as indices into a flattened board
+    of the given height, together with the index of the center cell.
+    :param radius: The radius of the diamond.
+    :param height: The y-dimension of the board.
+    :return: A tuple of a read-only array of indices and the center index.
+    """
+    offsets = diamond_array(radius)
+    flat = offsets[:, 0] * height + offsets[:, 1]
+    flat.flags.writeable = False
+    return flat, diamond(radius).index((0, 0))
+
+
+@lru_cache(maxsize=None)
+def attack_stamp(radius, attack):
+    """
+    Creates a square read-only array of 2 * radius + 1 cells wide, that holds
+    attack on the cells of diamond(radius) around its center and 0 elsewhere.
+    :param radius: The attack range of a Unit.
+    :param attack: The attack of a Unit.
+    :return: The (2 * radius + 1) x (2 * radius + 1) array.
+    """
+    stamp = np.zeros((2 * radius + 1, 2 * radius + 1), dtype=np.int64)
+    offsets = diamond_array(radius)
+    stamp[offsets[:, 0] + radius, offsets[:, 1] + radius] = attack
+    stamp.flags.writeable = False
+    return stamp
+
+
+# The smallest diamond radius for which looking up the free cells in the
+# occupancy grid at once is faster than checking them one by one, see
+# benchmark.py.
+OCCUPANCY_MIN_RADIUS = 3
 
 
 class State:
     """
     Creates a State object.
     """
-    def __init__(self, board_dimensions):
+    def __init__(self, board_dimensions, threat_map=False,
+                 occupancy_grid=False):
         """
         Initializes a State object. Sets the dimensions of the playing board,
-        creates a Unit list and a set of Unit positions.
+        creates a registry of the living Units by id, a roster of the living
+        Units per team and a dictionary of the Units by position.
         :param board_dimensions: The dimensions of the playing board.
+        :param threat_map: Whether to keep track of the total attack each team
+                           can deal on each cell of the board. This replaces
+                           a check of every enemy per scored move by a
+                           lookup, at the cost of updating the fields on
+                           every move, which only pays off when the moves
+                           are scored one by one instead of vectorized.
+        :param occupancy_grid: Whether to keep a boolean grid of the taken
+                               cells, to look up the free cells of a diamond
+                               at once with free_cells_array.
         """
         self.board_dimensions = board_dimensions
-        self.units = []
-        self.unit_positions = set()
+        self.live_units = {}
+        self.team_units = defaultdict(dict)
+        self.teams_alive = 0
+        self.unit_positions = {}
         self.original_units = []
         self.damage_done = defaultdict(int)
+        self.attack_fields = {} if threat_map else None
+        self.occupancy = None
+        if occupancy_grid:
+            self.occupancy = np.zeros(board_dimensions, dtype=bool)
+        self.version = 0
+        self.query_cache = {}
+        self.query_cache_version = 0
+
+    @property
+    def units(self):
+        """
+        Gets the living Units on the board, in the order they were added.
+        :return: A list of the living Units.
+        """
+        return list(self.live_units.values())
+
+    def allies_of(self, team):
+        """
+        Gets the living Units of team, in the order they were added.
+        :param team: The team whose Units are requested.
+        :return: A view of the living Units on team.
+        """
+        return self.team_units.get(team, {}).values()
+
+    def enemies_of(self, team):
+        """
+        Gets the living Units that are not on team, in the order they were
+        added.
+        :param team: The team whose enemies are requested.
+        :return: A view of the living Units on opposing team(s).
+        """
+        others = [t for t in self.team_units if t != team]
+        if len(others) == 1:
+            return self.team_units[others[0]].values()
+        return self.query(
+            ('enemies', team),
+            lambda: [u for u in self.live_units.values() if u.team != team]
+        )
+
+    def query(self, key, compute):
+        """
+        Gets a value derived from the current State, computing it only once
+        per version of the State. The version changes on every added Unit,
+        move and attack, which clears all cached values.
+        :param key: A hashable key that identifies the derived value.
+        :param compute: A function without arguments that computes the value.
+        :return: The (cached) derived value.
+        """
+        if self.query_cache_version != self.version:
+            self.query_cache.clear()
+            self.query_cache_version = self.version
+        if key not in self.query_cache:
+            self.query_cache[key] = compute()
+        return self.query_cache[key]
+
+    def is_alive(self, unit):
+        """
+        Checks whether unit is one of the living Units on the board.
+        :param unit: The Unit to check.
+        :return: True if unit is on the board, False otherwise.
+        """
+        return self.live_units.get(unit.id) is unit
+
+    def _update_attack_field(self, unit, sign):
+        """
+        Adds (sign 1) or removes (sign -1) the attack of unit to every cell of
+        the board within its attack range, in the attack field of its team.
+        The attack_stamp of unit is added to the cells around it at once,
+        clipped to the board.
+        :param unit: The Unit whose attack is added or removed.
+        :param sign: 1 to add the attack, -1 to remove it.
+        """
+        if unit.team not in self.attack_fields:
+            self.attack_fields[unit.team] = np.zeros(self.board_dimensions,
+                                                     dtype=np.int64)
+        field = self.attack_fields[unit.team]
+        width, height = self.board_dimensions
+        radius = unit.range
+        stamp = attack_stamp(radius, sign * unit.atk)
+        left, bottom = unit.x - radius, unit.y - radius
+        x0, y0 = max(0, left), max(0, bottom)
+        x1 = min(width, unit.x + radius + 1)
+        y1 = min(height, unit.y + radius + 1)
+        field[x0:x1, y0:y1] += stamp[x0 - left:x1 - left,
+                                     y0 - bottom:y1 - bottom]
+
+    def threat(self, team, pos):
+        """
+        Gets the total attack of the Units not on team that can attack pos.
+        Requires the State to be created with a threat map.
+        :param team: The team that is threatened.
+        :param pos: The position on the board, or a tuple of x and y arrays.
+        :return: The summed attack that can be dealt on pos.
+        """
+        total = 0
+        for t, field in self.attack_fields.items():
+            if t != team:
+                total += field[pos]
+        return total
 
     def add_unit(self, unit):
         """
-        Adds unit to the Unit list if the position of unit is not already used.
+        Adds unit to the board if the position of unit is not already used.
         :param unit: The Unit to add to the board.
+        :return: The Unit as it is stored on the board.
         """
         assert (unit.x, unit.y) not in self.unit_positions
+        assert unit.id not in self.live_units
         assert 0 <= unit.x < self.board_dimensions[0]
         assert 0 <= unit.y < self.board_dimensions[1]
-        self.units.append(unit)
-        self.unit_positions.add((unit.x, unit.y))
+        self.version += 1
+        self.live_units[unit.id] = unit
+        if not self.team_units[unit.team]:
+            self.teams_alive += 1
+        self.team_units[unit.team][unit.id] = unit
+        self.unit_positions[(unit.x, unit.y)] = unit
+        if self.occupancy is not None:
+            self.occupancy[unit.x, unit.y] = True
+        if self.attack_fields is not None:
+            self._update_attack_field(unit, 1)
+        return unit
+
+    def snapshot(self):
+        """
+        Takes a snapshot of the positions and hit points of the living Units
+        and of the damage done, which can be restored later on.
+        :return: The snapshot of the State.
+        """
+        return {
+            'units': [(u, u.x, u.y, u.hp) for u in self.live_units.values()],
+            'live_units': dict(self.live_units),
+            'team_units': {t: dict(us) for t, us in self.team_units.items()},
+            'unit_positions': dict(self.unit_positions),
+            'damage_done': dict(self.damage_done),
+            'occupancy': None if self.occupancy is None else
+            self.occupancy.copy()
+        }
+
+    def restore(self, snapshot):
+        """
+        Restores the State in place to the given snapshot. The Units of the
+        snapshot are reset to their positions and hit points at the time. The
+        attack fields are not copied, but the attack of the living Units is
+        removed and that of the Units of the snapshot is added again.
+        :param snapshot: A snapshot taken by State.snapshot.
+        """
+        if self.attack_fields is not None:
+            for unit in self.live_units.values():
+                self._update_attack_field(unit, -1)
+        for unit, x, y, hp in snapshot['units']:
+            unit.x, unit.y, unit.hp = x, y, hp
+        self.live_units = dict(snapshot['live_units'])
+        self.team_units = defaultdict(dict, {
+            t: dict(us) for t, us in snapshot['team_units'].items()
+        })
+        self.teams_alive = sum(1 for us in self.team_units.values() if us)
+        self.unit_positions = dict(snapshot['unit_positions'])
+        self.damage_done = defaultdict(int, snapshot['damage_done'])
+        if self.attack_fields is not None:
+            for unit in self.live_units.values():
+                self._update_attack_field(unit, 1)
+        if self.occupancy is not None:
+            self.occupancy[...] = snapshot['occupancy']
+        self.version += 1
 
     def simulate_move(self, unit, new_pos):
         """
@@ -36,9 +265,17 @@ class State:
         :param new_pos: The new position unit wants to move to.
         """
         assert self.movement_allowed(unit, new_pos)
-        self.unit_positions.remove((unit.x, unit.y))
-        self.unit_positions.add(new_pos)
+        self.version += 1
+        del self.unit_positions[(unit.x, unit.y)]
+        self.unit_positions[new_pos] = unit
+        if self.occupancy is not None:
+            self.occupancy[unit.x, unit.y] = False
+            self.occupancy[new_pos] = True
+        if self.attack_fields is not None:
+            self._update_attack_field(unit, -1)
         unit.x, unit.y = new_pos
+        if self.attack_fields is not None:
+            self._update_attack_field(unit, 1)
 
     def movement_allowed(self, unit, new_pos):
         """
@@ -49,13 +286,67 @@ class State:
         :param new_pos: The new position Unit wants to move to.
         :return: True if the Unit can move to the new position, False otherwise.
         """
-        return (unit in self.units
+        return (self.is_alive(unit)
                 and 0 <= new_pos[0] < self.board_dimensions[0]
                 and 0 <= new_pos[1] < self.board_dimensions[1]
                 and (new_pos == (unit.x, unit.y) or
                      new_pos not in self.unit_positions)
                 and unit.movement_allowed(new_pos))
 
+    def free_cells(self, unit, radius):
+        """
+        Generates the cells within radius of unit that unit may move to: on the
+        board and not taken by another Unit. Gives the same cells in the same
+        order as checking movement_allowed for every cell of the diamond, but
+        checks the board edges once for the whole diamond when it fits.
+        :param unit: The Unit that wants to move.
+        :param radius: The radius of the diamond, at most the move of unit.
+        :return: A generator of positions.
+        """
+        if not self.is_alive(unit):
+            return
+        x, y = unit.x, unit.y
+        width, height = self.board_dimensions
+        occupied = self.unit_positions
+        inside = (radius <= x < width - radius and
+                  radius <= y < height - radius)
+        for dx, dy in diamond(radius):
+            pos = (x + dx, y + dy)
+            if not inside and not (0 <= pos[0] < width and
+                                   0 <= pos[1] < height):
+                continue
+            if pos not in occupied or (dx == 0 and dy == 0):
+                yield pos
+
+    def free_cells_array(self, unit, radius):
+        """
+        Looks up all cells within radius of unit that unit may move to at once
+        in the occupancy grid, see free_cells. When the diamond fits on the
+        board, the cells are looked up by their index in the flattened grid
+        without checking the board edges. Requires the State to be created
+        with an occupancy grid. Only pays off from a radius of
+        OCCUPANCY_MIN_RADIUS, and only when the cells are used as an array.
+        :param unit: The Unit that wants to move.
+        :param radius: The radius of the diamond, at most the move of unit.
+        :return: A K x 2 array of positions, in the order of free_cells.
+        """
+        if not self.is_alive(unit):
+            return np.empty((0, 2), dtype=np.int64)
+        x, y = unit.x, unit.y
+        width, height = self.board_dimensions
+        if radius <= x < width - radius and radius <= y < height - radius:
+            offsets, center = diamond_flat(radius, height)
+            free = self.occupancy.ravel()[offsets + (x * height + y)]
+            np.logical_not(free, out=free)
+            free[center] = True
+            return diamond_array(radius)[free] + (x, y)
+        cells = diamond_array(radius) + (x, y)
+        cells = cells[(cells[:, 0] >= 0) & (cells[:, 0] < width) &
+                      (cells[:, 1] >= 0) & (cells[:, 1] < height)]
+        free = ~self.occupancy[cells[:, 0], cells[:, 1]]
+        free |= (cells[:, 0] == unit.x) & (cells[:, 1] == unit.y)
+        return cells[free]
+
     def attack_allowed(self, unit, attacked_unit):
         """
         Checks whether unit can attack attacked_unit (attacked_unit at attack
@@ -64,8 +355,8 @@ class State:
         :param attacked_unit: The Unit that is attacked by unit.
         :return: True if unit can attack attacked_unit, False otherwise.
         """
-        return (unit in self.units
-                and attacked_unit in self.units
+        return (self.is_alive(unit)
+                and self.is_alive(attacked_unit)
                 and unit.attack_allowed(attacked_unit))
 
     def simulate_attack(self, unit, attacked_unit):
@@ -79,11 +370,19 @@ class State:
         :param attacked_unit: Unit that is attacked by unit.
         """
         assert self.attack_allowed(unit, attacked_unit)
+        self.version += 1
         self.damage_done[unit.team] += min(unit.atk, attacked_unit.hp)
         attacked_unit.hp -= unit.atk
         if attacked_unit.is_dead():
-            self.unit_positions.remove((attacked_unit.x, attacked_unit.y))
-            self.units.remove(attacked_unit)
+            del self.unit_positions[(attacked_unit.x, attacked_unit.y)]
+            if self.occupancy is not None:
+                self.occupancy[attacked_unit.x, attacked_unit.y] = False
+            del self.live_units[attacked_unit.id]
+            del self.team_units[attacked_unit.team][attacked_unit.id]
+            if not self.team_units[attacked_unit.team]:
+                self.teams_alive -= 1
+            if self.attack_fields is not None:
+                self._update_attack_field(attacked_unit, -1)
 
     def game_finished(self):
         """
@@ -92,21 +391,34 @@ class State:
         :return: True if the number of teams alive is 1 or less, False
                  otherwise.
         """
-        alive_teams = []
-        for unit in self.units:
-            if unit.team not in alive_teams:
-                alive_teams.append(unit.team)
-        return len(alive_teams) <= 1
+        return self.teams_alive <= 1
+
+    def enemy_gap(self):
+        """
+        Gets the smallest distance between two Units of different teams.
+        :return: The smallest distance, or None if there are no two teams.
+        """
+        gap = None
+        for team, units in self.team_units.items():
+            for unit in units.values():
+                for enemy in self.enemies_of(team):
+                    distance = abs(unit.x - enemy.x) + abs(unit.y - enemy.y)
+                    if gap is None or distance < gap:
+                        gap = distance
+        return gap
 
     def evaluate_game(self, team):
         """
-        Evaluate the results of the game
+        Evaluate the results of the game. The score is the damage done by the
+        team, its hit points left and three points per Unit alive, which is
+        computed the same way whether the game was won, lost or ended early
+        by a turn limit or stalemate.
         """
         allies = list(filter(lambda x: x.team == team, self.original_units))
-        living_allies = list(filter(lambda x: x.team == team, self.units))
+        living_allies = self.allies_of(team)
         damage_done = self.damage_done[team]
         hp_left = sum(a.hp for a in living_allies)
-        units_alive = len(list(filter(lambda u: u in self.units, allies)))
+        units_alive = len(list(filter(self.is_alive, allies)))
         return damage_done + hp_left + units_alive * 3
 
     def __str__(self):
@@ -115,4 +427,4 @@ class State:
         current state.
         :return: An overwritten string object for the State class.
         """
-        return '\n'.join(str(u) for u in self.units)
+        return '\n'.join(str(u) for u in self.live_units.values())
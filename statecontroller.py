@@ -1,4 +1,5 @@
 from state import State
+from arraystate import ArrayState
 
 
 class StateController:
@@ -6,28 +7,65 @@ class StateController:
     Creates a StateController object.
     """
     def __init__(self, board_dimensions, team_ordering,
-                 turn_complete_callback=None):
+                 turn_complete_callback=None, threat_map=False,
+                 array_state=False, move_callback=None, attack_callback=None,
+                 instrumentation=None, max_turns=None,
+                 stalemate_turns=None, fast_forward=False,
+                 occupancy_grid=False):
         """
         Initializes a StateController object.
         :param board_dimensions: The x- and y-dimensions of the playing board.
         :param team_ordering: The turn order of the teams on the playing board.
         :param turn_complete_callback:
+        :param threat_map: Whether the State keeps track of the attack each
+                           team can deal on each cell.
+        :param array_state: Whether the Units are also kept in the NumPy
+                            arrays of an ArrayState, which the
+                            UnitControllers query for a whole army at once.
+        :param move_callback: Called with the Unit and its new position after
+                              every move.
+        :param attack_callback: Called with the Unit and the attacked Unit
+                                after every attack.
+        :param instrumentation: An Instrumentation that measures the phases
+                                of the games, if any.
+        :param max_turns: The number of turns after which a game ends, if
+                          any.
+        :param stalemate_turns: The number of turns without damage done and
+                                without the teams getting closer than before
+                                after which a game ends, if any.
+        :param fast_forward: Whether the turns in which the teams are too far
+                             apart to interact only move the Units, with the
+                             approach_movement of the UnitControllers,
+                             without deciding attacks or checking whether
+                             the game is finished.
+        :param occupancy_grid: Whether the State keeps a NumPy grid of the
+                               occupied cells to find the free cells with.
         """
-        self.state = State(board_dimensions)
+        state_class = ArrayState if array_state else State
+        self.state = state_class(board_dimensions, threat_map=threat_map,
+                                 occupancy_grid=occupancy_grid)
         self.unit_controllers = []
         self.team_ordering = team_ordering
         self.turn_complete_callback = turn_complete_callback
+        self.move_callback = move_callback
+        self.attack_callback = attack_callback
+        self.instrumentation = instrumentation
+        self.max_turns = max_turns
+        self.stalemate_turns = stalemate_turns
+        self.fast_forward = fast_forward
+        self.result = None
 
     def add_unit_controllers(self, unit_controllers):
         """
         Adds all the UnitControllers to the StateController. Also adds the
-        Units of the UnitControllers to the State of the StateController.
+        Units of the UnitControllers to the State of the StateController, the
+        UnitControllers get the Units as they are stored in the State.
         :param unit_controllers: A list of all the UnitController objects, one
                                  per Unit that should be on the board.
         """
         self.unit_controllers += unit_controllers
         for uc in unit_controllers:
-            self.state.add_unit(uc.unit)
+            uc.unit = self.state.add_unit(uc.unit)
         self.state.original_units = list(self.state.units)
 
     def get_team_ucs(self, team):
@@ -50,15 +88,22 @@ class StateController:
                                     key=lambda u: u.decide_order_weight()))
         return ordering
 
-    def process_movement(self, unit_controller):
+    def process_movement(self, unit_controller, approach=False):
         """
         Makes unit_controller act out the move action of the corresponding Unit
         if it has a new position.
         :param unit_controller: UnitController of the Unit that moves.
+        :param approach: Whether the move is made in an approach turn, see
+                         approach_turns.
         """
-        new_position = unit_controller.next_movement()
+        if approach:
+            new_position = unit_controller.approach_movement()
+        else:
+            new_position = unit_controller.next_movement()
         if new_position:
             self.state.simulate_move(unit_controller.unit, new_position)
+            if self.move_callback:
+                self.move_callback(unit_controller.unit, new_position)
 
     def process_attack(self, unit_controller):
         """
@@ -70,22 +115,112 @@ class StateController:
         attacked_unit = unit_controller.next_attack()
         if attacked_unit:
             self.state.simulate_attack(unit_controller.unit, attacked_unit)
+            if self.attack_callback:
+                self.attack_callback(unit_controller.unit, attacked_unit)
+
+    def approach_turns(self):
+        """
+        Calculates how many of the coming turns are approach turns, in which
+        no Unit can attack, be attacked or get an enemy within walking range.
+        Every Unit moves at most once per turn, so two enemies get at most two
+        times the largest movement closer per turn, and nothing can interact
+        while the smallest distance between the teams stays above two times
+        the largest movement plus the largest attack range.
+        :return: The number of coming approach turns.
+        """
+        units = self.state.units
+        gap = self.state.enemy_gap()
+        if gap is None:
+            return 0
+        max_move = max(u.move for u in units)
+        max_range = max(u.range for u in units)
+        if max_move == 0:
+            return 0
+        return max(0, (gap - max_range - 1) // (2 * max_move))
+
+    def process_turn(self):
+        """
+        Processes a turn, in which every living Unit moves and attacks in the
+        turn order, until only one team is alive.
+        :return: True if the game finished during the turn, False otherwise.
+        """
+        for u_c in self.get_turn_ordering():
+            if u_c.unit.is_dead(): 
+                continue
+            self.process_movement(u_c)
+            self.process_attack(u_c)
+            if self.state.game_finished():
+                return True
+        return False
+
+    def process_approach_turn(self):
+        """
+        Processes an approach turn, in which the Units only move.
+        """
+        for u_c in self.get_turn_ordering():
+            if u_c.unit.is_dead():
+                continue
+            self.process_movement(u_c, approach=True)
+
+    def early_end(self, turn, stalemate):
+        """
+        Checks after a turn whether the game ends before a team has won,
+        because of the turn limit or a stalemate.
+        :param turn: The turn that was just completed.
+        :param stalemate: A dictionary that keeps track of the damage done,
+                          the smallest distance between the teams and the
+                          number of turns without progress in either.
+        :return: 'turn_limit' or 'stalemate' if the game ends, None otherwise.
+        """
+        if self.max_turns is not None and turn >= self.max_turns:
+            return 'turn_limit'
+        if self.stalemate_turns is None:
+            return None
+        damage = sum(self.state.damage_done.values())
+        gap = self.state.enemy_gap()
+        if (damage > stalemate['damage'] or stalemate['gap'] is None
+                or gap < stalemate['gap']):
+            stalemate.update(damage=damage, gap=gap, turns=0)
+        else:
+            stalemate['turns'] += 1
+        if stalemate['turns'] >= self.stalemate_turns:
+            return 'stalemate'
+        return None
 
     def process_game(self):
         """
-        Processes an entire game until only one team is alive.
+        Processes an entire game until only one team is alive, or until the
+        turn limit or a stalemate ends it.
+        :return: The way the game ended, 'finished' if only one team is
+                 alive, 'turn_limit' or 'stalemate' otherwise. It is also
+                 stored in result.
         """
+        if self.instrumentation is not None:
+            self.instrumentation.attach(self)
         not_finished = True
         turn = 1
+        stalemate = {'damage': sum(self.state.damage_done.values()),
+                     'gap': None, 'turns': 0}
+        self.result = None
+        approach_turns = 0
+        fast_forward = self.fast_forward
         while not_finished:
-            for u_c in self.get_turn_ordering():
-                if u_c.unit.is_dead(): 
-                    continue
-                self.process_movement(u_c)
-                self.process_attack(u_c)
-                if self.state.game_finished():
-                    not_finished = False
-                    break
+            if fast_forward and approach_turns == 0:
+                approach_turns = self.approach_turns()
+                # Once the teams are within reach, they are not checked again.
+                fast_forward = approach_turns > 0
+            if approach_turns > 0:
+                approach_turns -= 1
+                self.process_approach_turn()
+            elif self.process_turn():
+                not_finished = False
+                self.result = 'finished'
             if self.turn_complete_callback:
                 self.turn_complete_callback(turn, self.state)
+            if not_finished:
+                self.result = self.early_end(turn, stalemate)
+                not_finished = self.result is None
             turn += 1
+        if self.instrumentation is not None:
+            self.instrumentation.game_complete(turn - 1)
+        return self.result
@@ -0,0 +1,107 @@
+import itertools
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+
+# The files a finished run leaves in its directory, its figure is rendered
+# separately by the report stage.
+RESULT_FILES = ['genes.json', 'scores.csv']
+
+
+def configurations(grid):
+    """
+    Creates every configuration of a parameter grid.
+    :param grid: A dictionary of parameter name to the list of its values.
+    :return: A list of dictionaries of parameter name to value, in the order
+             of nested loops over the parameters of grid.
+    """
+    names = list(grid)
+    return [dict(zip(names, values))
+            for values in itertools.product(*(grid[n] for n in names))]
+
+
+def run_name(config):
+    """
+    Names the directory of the results of a configuration after its
+    parameters.
+    """
+    return '_'.join(f'{key}_{value}' for key, value in config.items())
+
+
+def finished(directory):
+    """
+    Checks whether all result files of a run exist in directory.
+    """
+    return all(os.path.exists(os.path.join(directory, f))
+               for f in RESULT_FILES)
+
+
+def _run(experiment, config, directory):
+    """
+    Runs experiment for a configuration in a pool worker and records its
+    outcome in the run.json of its directory.
+    :return: The outcome of the run.
+    """
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    try:
+        outcome = {'status': 'finished', **experiment(directory, **config)}
+    except Exception:
+        outcome = {'status': 'failed', 'error': traceback.format_exc()}
+    outcome['seconds'] = time.perf_counter() - start
+    with open(os.path.join(directory, 'run.json'), 'w') as f:
+        f.write(json.dumps(outcome, indent=2))
+    return outcome
+
+
+def sweep(experiment, grid, save_dir, name=run_name, workers=None):
+    """
+    Runs experiment for every configuration of grid that has not finished
+    before, at the same time in a process pool, and writes an index.json of
+    all runs to save_dir. A failing configuration does not stop the others,
+    running the sweep again retries it.
+    :param experiment: A picklable function that takes the directory of a
+                       run and the parameters of a configuration as keyword
+                       arguments, writes the RESULT_FILES to the directory
+                       and returns a JSON serializable dictionary that
+                       describes the run.
+    :param grid: A dictionary of parameter name to the list of its values.
+    :param save_dir: The directory in which every run gets a directory.
+    :param name: A function that names the directory of a configuration.
+    :param workers: The number of processes, by default one per
+                    configuration that has to run, but at most one per CPU.
+    :return: The index, a list with a dictionary per configuration.
+    """
+    index = []
+    pending = []
+    for config in configurations(grid):
+        directory = os.path.join(save_dir, name(config))
+        entry = {'config': config, 'directory': directory}
+        index.append(entry)
+        if finished(directory):
+            entry['status'] = 'skipped'
+        else:
+            pending.append(entry)
+    if pending:
+        workers = workers or min(len(pending), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run, experiment, entry['config'],
+                                   entry['directory'])
+                       for entry in pending]
+            for entry, future in zip(pending, futures):
+                entry.update(future.result())
+    for entry in index:
+        if entry['status'] == 'skipped':
+            run_file = os.path.join(entry['directory'], 'run.json')
+            if os.path.exists(run_file):
+                with open(run_file) as f:
+                    previous = json.loads(f.read())
+                previous.pop('status', None)
+                entry.update(previous)
+    os.makedirs(save_dir, exist_ok=True)
+    with open(os.path.join(save_dir, 'index.json'), 'w') as f:
+        f.write(json.dumps(index, indent=2))
+    return index
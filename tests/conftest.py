@@ -0,0 +1,42 @@
+import os
+import sys
+import pytest
+
+# The modules of the package live in the root of the repository.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unit import Unit
+from unitcontrollers import AIUnitController
+from evolutionaryalgorithm import EvoluationaryAlgorithm
+
+
+STATS = [{'hp': 30, 'atk': 4, 'range': 1, 'move': 3},
+         {'hp': 45, 'atk': 2, 'range': 1, 'move': 2},
+         {'hp': 25, 'atk': 6, 'range': 2, 'move': 3},
+         {'hp': 20, 'atk': 6, 'range': 2, 'move': 3},
+         {'hp': 35, 'atk': 2, 'range': 1, 'move': 3}]
+
+
+def create_ea(army_size, gap, **options):
+    """
+    Creates an EvoluationaryAlgorithm of two armies gap columns apart, along
+    the bottom edge of a small board such that the edges are hit.
+    """
+    chaos, order = [], []
+    for i in range(army_size):
+        stats = STATS[i % len(STATS)]
+        x, y = 2 * (i // 5), i % 5
+        chaos.append(Unit((x, y), stats, 'Chaos', f'Chaos{i}'))
+        order.append(AIUnitController(
+            Unit((x + gap, y), stats, 'Order', f'Order{i}'), None))
+    return EvoluationaryAlgorithm((gap + 20, 20), chaos, order,
+                                  ['Order', 'Chaos'], random_seed=2112,
+                                  **options)
+
+
+@pytest.fixture
+def make_ea():
+    """
+    Gives create_ea to a test.
+    """
+    return create_ea
@@ -0,0 +1,39 @@
+import random
+import pytest
+from fitnesscache import FitnessCache
+
+
+# The simulation options that must give the same games as the default ones.
+BACKENDS = [
+    {'vectorized': True},
+    {'threat_map': True},
+    {'threat_map': True, 'vectorized': True},
+    {'array_state': True},
+    {'array_state': True, 'vectorized': True},
+    {'array_state': True, 'threat_map': True},
+    {'fast_forward': True},
+    {'fast_forward': True, 'vectorized': True},
+    {'fast_forward': True, 'array_state': True, 'vectorized': True},
+    {'occupancy_grid': True},
+    {'occupancy_grid': True, 'vectorized': True},
+    {'batched': True},
+]
+
+
+def scores(ea, games=4):
+    """
+    Plays the same random genes every time, without the fitness cache.
+    """
+    ea.random = random.Random(0)
+    ea.cache = FitnessCache(0)
+    return ea.evaluate(ea.init_pop(games))
+
+
+@pytest.mark.parametrize('options', BACKENDS, ids=str)
+@pytest.mark.parametrize('army_size, gap', [(3, 2), (10, 12)])
+def test_backend_scores_equal_default(make_ea, options, army_size, gap):
+    expected = scores(make_ea(army_size, gap))
+    assert scores(make_ea(army_size, gap, **options)) == expected
+    # Replaying on the restored State gives the same games again.
+    ea = make_ea(army_size, gap, **options)
+    assert scores(ea) == scores(ea) == expected
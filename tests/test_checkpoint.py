@@ -0,0 +1,51 @@
+import pytest
+from checkpoint import EpochLog, load_checkpoint
+
+
+def run(make_ea, tmp_path, history, epochs, resume=False):
+    tmp_path.mkdir(exist_ok=True)
+    history_file = str(tmp_path / 'history.jsonl') if history else None
+    return make_ea(3, 2).ea(pop_size=4, epochs=epochs,
+                            checkpoint=str(tmp_path / 'run.pkl'),
+                            history=history_file, resume=resume)
+
+
+@pytest.mark.parametrize('history', [False, True])
+def test_resume_gives_the_same_run(make_ea, tmp_path, history):
+    expected = run(make_ea, tmp_path / 'whole', history, epochs=3)
+    run(make_ea, tmp_path / 'split', history, epochs=2)
+    assert run(make_ea, tmp_path / 'split', history, epochs=3,
+               resume=True) == expected
+
+
+@pytest.mark.parametrize('history', [False, True])
+def test_resume_with_other_history_mode_fails(make_ea, tmp_path, history):
+    run(make_ea, tmp_path, history, epochs=1)
+    with pytest.raises(ValueError, match='history file'):
+        run(make_ea, tmp_path, not history, epochs=2, resume=True)
+
+
+def test_checkpoints_do_not_hold_the_history(make_ea, tmp_path):
+    evals = run(make_ea, tmp_path, False, epochs=3)[1]
+    state = load_checkpoint(str(tmp_path / 'run.pkl'))
+    assert 'evals' not in state and 'best_individuals' not in state
+    logged = EpochLog.read(str(tmp_path / 'run.pkl.history'))[0]
+    assert logged == evals and len(evals) == 3
+
+
+def test_history_run_returns_only_the_last_epoch(make_ea, tmp_path):
+    expected = run(make_ea, tmp_path / 'memory', False, epochs=3)
+    best, evals, best_individuals = run(make_ea, tmp_path / 'history', True,
+                                        epochs=3)
+    assert best == expected[0]
+    assert evals == expected[1][-1:]
+    assert best_individuals == expected[2][-1:]
+    assert (EpochLog.read(str(tmp_path / 'history' / 'history.jsonl')) ==
+            expected[1:])
+
+
+def test_resume_in_another_scenario_fails(make_ea, tmp_path):
+    run(make_ea, tmp_path, False, epochs=1)
+    with pytest.raises(ValueError, match='another scenario'):
+        make_ea(3, 3).ea(pop_size=4, epochs=2,
+                         checkpoint=str(tmp_path / 'run.pkl'), resume=True)
@@ -0,0 +1,103 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from distributed import Coordinator, send_message, receive_message
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_worker(address):
+    """
+    Starts run_worker in a subprocess that connects to address.
+    """
+    if not isinstance(address, str):
+        address = f'{address[0]}:{address[1]}'
+    return subprocess.Popen([sys.executable, 'distributed.py', address],
+                            cwd=ROOT, stdout=subprocess.DEVNULL)
+
+
+def wait_for_workers(coordinator, workers, timeout=30):
+    deadline = time.monotonic() + timeout
+    while coordinator.workers < workers:
+        assert time.monotonic() < deadline, 'the workers did not connect'
+        time.sleep(0.01)
+
+
+def drop_a_batch(address, dropped):
+    """
+    Connects like a worker, but closes the connection as soon as it gets a
+    batch, and sets dropped.
+    """
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    with socket.socket(family, socket.SOCK_STREAM) as connection:
+        connection.connect(address)
+        receive_message(connection)
+        if 'genes' in receive_message(connection):
+            dropped.set()
+
+
+def run(ea, **options):
+    return ea.ea(pop_size=4, epochs=2, **options)
+
+
+@pytest.fixture(params=['tcp', 'unix'])
+def address(request, tmp_path):
+    if request.param == 'tcp':
+        return '127.0.0.1', 0
+    return str(tmp_path / 'coordinator.sock')
+
+
+def test_coordinator_gives_the_serial_scores(make_ea, address):
+    expected = run(make_ea(3, 2))
+    ea = make_ea(3, 2)
+    with Coordinator(ea, address, deadline=60) as coordinator:
+        workers = [start_worker(coordinator.address) for _ in range(2)]
+        try:
+            assert run(ea, coordinator=coordinator) == expected
+        finally:
+            coordinator.close()
+            for worker in workers:
+                worker.wait(timeout=30)
+
+
+def test_a_dropped_batch_is_handed_out_again(make_ea, address):
+    expected = run(make_ea(3, 2))
+    ea = make_ea(3, 2)
+    with Coordinator(ea, address, deadline=60) as coordinator:
+        worker = start_worker(coordinator.address)
+        try:
+            wait_for_workers(coordinator, 1)
+            dropped = threading.Event()
+            threading.Thread(target=drop_a_batch,
+                             args=(coordinator.address, dropped),
+                             daemon=True).start()
+            wait_for_workers(coordinator, 2)
+            assert run(ea, coordinator=coordinator) == expected
+            assert dropped.is_set()
+        finally:
+            coordinator.close()
+            worker.wait(timeout=30)
+
+
+def test_map_fails_when_no_worker_is_left(make_ea, address):
+    ea = make_ea(3, 2)
+    with Coordinator(ea, address, deadline=60) as coordinator:
+        dropped = threading.Event()
+        threading.Thread(target=drop_a_batch,
+                         args=(coordinator.address, dropped),
+                         daemon=True).start()
+        wait_for_workers(coordinator, 1)
+        with pytest.raises(RuntimeError, match='No worker is left'):
+            coordinator.map(None, [ea.init_individual()], [ea.random_seed])
+        assert dropped.is_set()
+
+
+def test_map_fails_after_the_deadline(make_ea):
+    ea = make_ea(3, 2)
+    with Coordinator(ea, ('127.0.0.1', 0), deadline=0.1) as coordinator:
+        with pytest.raises(RuntimeError, match='within 0.1 seconds'):
+            coordinator.map(None, [ea.init_individual()], [ea.random_seed])
@@ -0,0 +1,128 @@
+import queue
+import random
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('options', [{}, {'racing_seeds': [1, 2, 3]}],
+                         ids=str)
+def test_process_pool_gives_the_serial_run(make_ea, options):
+    expected = make_ea(3, 2, **options).ea(pop_size=6, epochs=3, workers=1)
+    best, evals, best_individuals = make_ea(3, 2, **options).ea(
+        pop_size=6, epochs=3, workers=2)
+    assert evals == expected[1]
+    assert best == expected[0]
+    assert best_individuals == expected[2]
+
+
+@pytest.mark.parametrize('topology', ['ring', 'random'])
+def test_island_runs_are_deterministic(make_ea, topology):
+    def run():
+        return make_ea(3, 2).island_ea(islands=3, pop_size=4, epochs=3,
+                                       migration_interval=1, migrants=1,
+                                       topology=topology)
+
+    best, evals, best_individuals = run()
+    assert len(evals) == len(best_individuals) == 3
+    assert run() == (best, evals, best_individuals)
+
+
+@pytest.mark.parametrize('topology', ['ring', 'random'])
+def test_migration_routes_form_a_ring(make_ea, topology):
+    ea = make_ea(3, 2)
+    islands = 4
+    randoms = [random.Random(ea.random_seed) for _ in range(islands)]
+    for _ in range(5):
+        routes = [ea._migration_route(i, islands, topology, randoms[i])
+                  for i in range(islands)]
+        for island, (target, source) in enumerate(routes):
+            assert routes[target][1] == island
+            assert routes[source][0] == island
+            if topology == 'ring':
+                assert target == (island + 1) % islands
+        assert len({target for target, _ in routes}) == islands
+
+
+@pytest.mark.parametrize('topology', ['ring', 'random'])
+def test_migrants_replace_the_lowest_survivors(make_ea, topology):
+    ea = make_ea(3, 2)
+    islands, pop_size, epochs, migrants = 3, 6, 5, 2
+    # Every other island has sent its migrants already, so the island does
+    # not wait for them.
+    inboxes = [queue.Queue() for _ in range(islands)]
+    sent = {}
+    for epoch in range(1, epochs - 1, 2):
+        for sender in (1, 2):
+            sent[epoch, sender] = [ea.init_individual()
+                                   for _ in range(migrants)]
+            inboxes[0].put((epoch, sender, sent[epoch, sender]))
+    evaluated = []
+    fitness = ea.fitness
+
+    def record(population, pool=None):
+        scores = fitness(population, pool)
+        evaluated.append((population, scores))
+        return scores
+
+    ea.fitness = record
+    ea._island_ea(0, islands, pop_size, epochs, 0.2, 2, migrants, topology,
+                  inboxes)
+
+    routes = random.Random(ea.random_seed)
+    survivors = pop_size // 2
+    for epoch in range(1, epochs - 1, 2):
+        target, source = ea._migration_route(0, islands, topology, routes)
+        population, scores = evaluated[epoch]
+        ranked = [p for p, _ in sorted(zip(population, scores),
+                                       key=lambda s: -s[1])]
+        _, sender, individuals = inboxes[target].get_nowait()
+        assert sender == 0 and individuals == ranked[:migrants]
+        next_population = evaluated[epoch + 1][0]
+        assert (next_population[:survivors - migrants] ==
+                ranked[:survivors - migrants])
+        assert (next_population[survivors - migrants:survivors] ==
+                sent[epoch, source])
+
+
+def test_mutated_array_genes_stay_in_bounds(make_ea):
+    ea = make_ea(3, 2, array_genomes=True)
+    genes = ea.init_pop(50)
+    genes[:10] = 0
+    genes[10:20] = 0.99
+    ea.mutate_array(genes, 1)
+    hundredths = genes * 100
+    assert ((0 <= genes) & (genes <= 0.99)).all()
+    assert np.allclose(hundredths, np.round(hundredths))
+
+
+@pytest.mark.parametrize('weights', [[3, 1, 4, 1, 5], [0, 3, 0, 2, 1, 0],
+                                     [2, 0, 0, 7]])
+def test_weighted_random_array_never_picks_the_excluded(make_ea, weights):
+    ea = make_ea(3, 2, array_genomes=True)
+    weights = np.array(weights, dtype=float)
+    for excluded in range(len(weights)):
+        exclude = np.full(2000, excluded)
+        picks = ea.weighted_random_array(weights, len(exclude), exclude)
+        assert (picks != exclude).all()
+        # Individuals without weight are never picked either.
+        assert (weights[picks] > 0).all()
+
+
+@pytest.mark.parametrize('pop_size', [1, 3, 7])
+def test_odd_array_populations(make_ea, pop_size):
+    ea = make_ea(3, 2, array_genomes=True)
+    population = ea.init_pop(pop_size)
+    assert population.shape == (pop_size, 3, 5)
+    sorted_sims = list(zip(population, range(pop_size, 0, -1)))
+    children = ea.next_generation(sorted_sims, pop_size, 0.5)
+    assert children.shape == population.shape
+    assert (children[:pop_size // 2] == population[:pop_size // 2]).all()
+
+
+def test_array_genome_runs_are_reproducible(make_ea):
+    def run():
+        return make_ea(3, 2, array_genomes=True).ea(pop_size=5, epochs=3)
+
+    best, evals, best_individuals = run()
+    assert isinstance(best, dict)
+    assert run() == (best, evals, best_individuals)
@@ -0,0 +1,31 @@
+import pickle
+from instrumentation import Instrumentation
+
+
+def test_instrumented_game_can_be_pickled(make_ea):
+    ea = make_ea(3, 2, instrumentation=Instrumentation())
+    genes = ea.init_individual()
+    score = ea.simulation(genes)
+    report = ea.instrumentation.report()
+
+    copy = pickle.loads(pickle.dumps(ea))
+    assert copy.simulation(genes) == score
+    # The copy measures its own games, with the methods wrapped only once.
+    assert copy.instrumentation.report()['phases'] == {
+        phase: {'seconds': copy.instrumentation.seconds[phase],
+                'calls': 2 * measured['calls']}
+        for phase, measured in report['phases'].items()
+    }
+    assert ea.instrumentation.report()['phases'] == report['phases']
+
+
+def test_approach_moves_are_measured_once(make_ea):
+    calls = []
+    for fast_forward in (False, True):
+        ea = make_ea(3, 12, instrumentation=Instrumentation(),
+                     fast_forward=fast_forward)
+        ea.simulation(ea.init_individual())
+        calls.append(ea.instrumentation.report()['phases'][
+            'decide_movement']['calls'])
+    # The games are the same, so are the movement decisions.
+    assert calls[0] == calls[1] > 0
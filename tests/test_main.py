@@ -0,0 +1,47 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from main import experiment_name
+import sweep as sweep_module
+from sweep import sweep, RESULT_FILES
+
+
+def fake_experiment(directory, **config):
+    for file_name in RESULT_FILES:
+        with open(os.path.join(directory, file_name), 'w') as f:
+            f.write('')
+    return {}
+
+
+def test_experiment_name_includes_every_parameter():
+    config = {'army_size': 6, 'pop_size': 10, 'point_mutate': 0.2,
+              'epochs': 30}
+    assert experiment_name(config) == '6_vs_6_PM_0.2_PS_10_epochs_30'
+    assert (experiment_name(dict(config, epochs=5)) !=
+            experiment_name(config))
+
+
+def test_runs_that_differ_in_epochs_are_not_skipped(tmp_path):
+    grid = {'army_size': [6], 'pop_size': [10], 'point_mutate': [0.2]}
+    first = sweep(fake_experiment, dict(grid, epochs=[1]), str(tmp_path),
+                  name=experiment_name)
+    second = sweep(fake_experiment, dict(grid, epochs=[2]), str(tmp_path),
+                   name=experiment_name)
+    assert first[0]['status'] == second[0]['status'] == 'finished'
+    assert first[0]['directory'] != second[0]['directory']
+
+
+def test_sweep_runs_at_most_one_process_per_cpu(tmp_path, monkeypatch):
+    pools = []
+
+    class RecordingPool(ThreadPoolExecutor):
+        def __init__(self, max_workers):
+            pools.append(max_workers)
+            super().__init__(max_workers)
+
+    monkeypatch.setattr(sweep_module, 'ProcessPoolExecutor', RecordingPool)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    grid = {'army_size': [6], 'pop_size': [10], 'point_mutate': [0.2],
+            'epochs': [1, 2, 3]}
+    index = sweep(fake_experiment, grid, str(tmp_path))
+    assert pools == [2]
+    assert [entry['status'] for entry in index] == ['finished'] * 3
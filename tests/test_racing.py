@@ -0,0 +1,53 @@
+import pytest
+import evolutionaryalgorithm
+from evolutionaryalgorithm import EvoluationaryAlgorithm
+
+
+class CountingPool:
+    """
+    A process pool stand-in that simulates in this process and records the
+    number of games of every map.
+    """
+
+    def __init__(self):
+        self.maps = []
+
+    def map(self, function, *iterables):
+        arguments = [list(iterable) for iterable in iterables]
+        self.maps.append(len(arguments[0]))
+        return list(map(function, *arguments))
+
+
+def racing_ea(make_ea):
+    ea = make_ea(3, 2, racing_seeds=list(range(1, 16)), cache_size=0)
+    ea.random.seed(0)
+    return ea, ea.init_pop(10)
+
+
+def test_racing_plays_a_third_of_the_games(make_ea, monkeypatch):
+    simulations = []
+    simulation = EvoluationaryAlgorithm.simulation
+    monkeypatch.setattr(EvoluationaryAlgorithm, 'simulation',
+                        lambda ea, genes: simulations.append(genes) or
+                        simulation(ea, genes))
+    ea, population = racing_ea(make_ea)
+    ea.evaluate_racing(population)
+    # Rounds of 1, 2, 4 and the last 8 seeds for 10, 5, 3 and 2 individuals.
+    assert len(simulations) == 10 + 10 + 12 + 16
+
+
+def test_racing_maps_every_round_at_once(make_ea, monkeypatch):
+    ea, population = racing_ea(make_ea)
+    expected = ea.evaluate_racing(population)
+    pool = CountingPool()
+    monkeypatch.setattr(evolutionaryalgorithm, '_worker_ea', ea)
+    assert ea.evaluate_racing(population, pool) == expected
+    assert pool.maps == [10, 10, 12, 16]
+
+
+@pytest.mark.parametrize('options', [{'racing_initial': 0},
+                                     {'racing_keep': 0},
+                                     {'racing_keep': 1.5}], ids=str)
+def test_invalid_racing_options_fail(make_ea, options):
+    with pytest.raises(ValueError, match='racing'):
+        make_ea(3, 2, racing_seeds=[1, 2, 3], **options)
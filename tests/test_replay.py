@@ -0,0 +1,51 @@
+import os
+import pytest
+from replay import ReplayReader
+
+
+def units_of(state):
+    return sorted((u.id, u.x, u.y, u.hp) for u in state.units)
+
+
+def test_replay_rebuilds_the_live_states(make_ea, tmp_path):
+    ea = make_ea(3, 2, replay_dir=str(tmp_path))
+    genes = ea.init_individual()
+    score = ea.simulation(genes)
+    (replay_file,) = os.listdir(tmp_path)
+
+    # Play the game again, recording the live States with a callback that
+    # the recorder is chained to.
+    scenario = ea.game_scenario
+    live = [sorted((u.id, x, y, hp)
+                   for u, x, y, hp in scenario.initial_state['units'])]
+
+    def record_live(turn, state):
+        live.append(units_of(state))
+
+    scenario.state_controller.turn_complete_callback = record_live
+    assert ea.simulation(genes) == score
+    assert scenario.state_controller.turn_complete_callback is record_live
+    assert os.listdir(tmp_path) == [replay_file]
+    assert len(live) > 2
+
+    reader = ReplayReader(str(tmp_path / replay_file))
+    try:
+        assert len(reader) == len(live) - 1
+        for turn, units in enumerate(live):
+            assert units_of(reader.state_at(turn)) == units
+    finally:
+        reader.close()
+
+
+def test_recorder_gives_the_callbacks_back(make_ea, tmp_path):
+    ea = make_ea(3, 2, replay_dir=str(tmp_path))
+    ea.simulation(ea.init_individual())
+    controller = ea.game_scenario.state_controller
+    assert controller.move_callback is None
+    assert controller.attack_callback is None
+    assert controller.turn_complete_callback is None
+
+
+def test_batched_games_cannot_be_recorded(make_ea, tmp_path):
+    with pytest.raises(ValueError, match='replays'):
+        make_ea(3, 2, batched=True, replay_dir=str(tmp_path))
@@ -0,0 +1,17 @@
+import random
+import pytest
+from state import State
+from unit import Unit
+
+
+@pytest.mark.parametrize('radius', [1, 2, 3, 5])
+def test_free_cells_array_matches_free_cells(radius):
+    state = State((9, 7), occupancy_grid=True)
+    cells = [(x, y) for x in range(9) for y in range(7)]
+    rng = random.Random(radius)
+    units = [state.add_unit(Unit(pos, {'hp': 1, 'atk': 1, 'range': 1,
+                                       'move': radius}, 'A'))
+             for pos in rng.sample(cells, 20)]
+    for unit in units:
+        assert (list(map(tuple, state.free_cells_array(unit, radius).tolist()))
+                == list(state.free_cells(unit, radius)))
@@ -0,0 +1,85 @@
+import pytest
+from batchsimulator import BatchSimulator
+from evolutionaryalgorithm import EvoluationaryAlgorithm
+from unit import Unit
+from unitcontrollers import AIUnitController
+
+
+def play(ea, genes):
+    """
+    Plays a game in a StateController.
+    :return: The score, the way the game ended and the number of turns.
+    """
+    turns = []
+    score = ea.simulation(genes)
+    controller = ea.game_scenario.state_controller
+    controller.turn_complete_callback = lambda turn, state: turns.append(turn)
+    assert ea.simulation(genes) == score
+    return score, controller.result, turns[-1]
+
+
+def play_batched(ea, genes, monkeypatch):
+    """
+    Plays the same game in a BatchSimulator.
+    :return: The score and the turn in which the game ended early, if any.
+    """
+    end_turns = []
+    early_end = BatchSimulator._early_end
+
+    def record(simulator, turn, *args):
+        ended = early_end(simulator, turn, *args)
+        if ended.any():
+            end_turns.append(turn)
+        return ended
+
+    monkeypatch.setattr(BatchSimulator, '_early_end', record)
+    ea.batched = True
+    score, = ea.evaluate([genes])
+    return score, end_turns[0] if end_turns else None
+
+
+def standoff_ea(**options):
+    """
+    Creates an EvoluationaryAlgorithm in which no Unit can move, one pair of
+    Units fights until one dies and the others never reach each other.
+    """
+    stats = {'hp': 10, 'atk': 3, 'range': 1, 'move': 0}
+    chaos = [Unit((0, 0), stats, 'Chaos', 'Chaos0'),
+             Unit((0, 5), stats, 'Chaos', 'Chaos1')]
+    order = [AIUnitController(Unit((1, 0), stats, 'Order', 'Order0'), None),
+             AIUnitController(Unit((9, 9), stats, 'Order', 'Order1'), None)]
+    return EvoluationaryAlgorithm((10, 10), chaos, order, ['Order', 'Chaos'],
+                                  cache_size=0, **options)
+
+
+@pytest.mark.parametrize('stalemate_turns', [1, 3])
+def test_game_without_moves_ends_in_a_stalemate(stalemate_turns,
+                                                monkeypatch):
+    ea = standoff_ea(stalemate_turns=stalemate_turns)
+    genes = ea.init_individual()
+    score, result, turns = play(ea, genes)
+    # Order0 kills Chaos0 in turn 4, after which nothing changes. Chaos0
+    # did 9 damage and Chaos1 is left with its 10 hit points.
+    assert result == 'stalemate'
+    assert turns == 4 + stalemate_turns
+    assert score == 9 + 10 + 3
+    assert play_batched(ea, genes, monkeypatch) == (score, turns)
+
+
+@pytest.mark.parametrize('max_turns', [1, 2, 3, 5])
+def test_game_ends_at_the_turn_limit(make_ea, max_turns, monkeypatch):
+    ea = make_ea(3, 2, max_turns=max_turns, cache_size=0)
+    genes = ea.init_individual()
+    score, result, turns = play(ea, genes)
+    assert result == 'turn_limit'
+    assert turns == max_turns
+    assert play_batched(ea, genes, monkeypatch) == (score, turns)
+
+
+def test_capped_games_score_the_state_at_the_cap(make_ea):
+    genes = make_ea(3, 2).init_individual()
+    scores = [play(make_ea(3, 2, max_turns=max_turns), genes)[0]
+              for max_turns in (1, 5)]
+    uncapped, result, _ = play(make_ea(3, 2), genes)
+    assert result == 'finished'
+    assert scores[0] != scores[1] != uncapped
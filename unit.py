@@ -1,10 +1,14 @@
 class Unit:
     """
-    Represents a Unit placed in the world.
+    Represents a Unit placed in the world. A Unit has slots instead of an
+    attribute dictionary, which keeps large armies small in memory.
     """
-    
-    # id used for the initialization of Unit ids.
-    id = 1
+    __slots__ = ('original_stats', 'team', 'max_hp', 'hp', 'atk', 'range',
+                 'move', 'x', 'y', 'name', 'id')
+
+    # id used for the initialization of Unit ids, it cannot be named id as
+    # that is a slot.
+    next_id = 1
 
     def __init__(self, location, stats, team, name=''):
         """
@@ -24,8 +28,8 @@ class Unit:
         self.x = location[0]
         self.y = location[1]
         self.name = name
-        self.id = Unit.id
-        Unit.id += 1
+        self.id = Unit.next_id
+        Unit.next_id += 1
 
     def clone_original(self):
         """
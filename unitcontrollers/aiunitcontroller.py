@@ -1,4 +1,6 @@
 import random
+import numpy as np
+from arraystate import ArrayState
 from unitcontrollers.unitcontroller import UnitController
 
 
@@ -19,14 +21,10 @@ class AIUnitController(UnitController):
 
     def get_enemies(self):
         """
-        Gets a list of Units on the opposing team(s).
-        :return: Returns a list of Units on opposing team(s).
+        Gets the Units on the opposing team(s).
+        :return: Returns a view of the Units on opposing team(s).
         """
-        res = []
-        for u in self.state.units:
-            if u.team != self.unit.team:
-                res.append(u)
-        return res
+        return self.state.enemies_of(self.unit.team)
 
     def distance(self, x, y, u2):
         """
@@ -41,8 +39,20 @@ class AIUnitController(UnitController):
     def get_closest_enemy(self):
         """
         Gets the enemy closest to the Unit belonging to this UnitController.
+        In an ArrayState the distances of all enemies are computed at once
+        from its arrays, the first enemy with the lowest distance is chosen in
+        both cases.
         :return: The enemy closest to the Unit belonging to this UnitController
         """
+        state = self.state
+        if isinstance(state, ArrayState):
+            rows = state.rows_of(self.unit.team, enemies=True)
+            if not len(rows):
+                return None
+            distances = np.abs(np.abs(state.x[rows] - self.unit.x) +
+                               np.abs(state.y[rows] - self.unit.y) -
+                               self.unit.range)
+            return state.row_units[rows[np.argmin(distances)]]
         closest_enemy, closest_distance = None, 99999
         for enemy in self.get_enemies():
             dist = self.distance(self.unit.x, self.unit.y, enemy)
@@ -87,3 +97,15 @@ class AIUnitController(UnitController):
         these controllers use randomness.
         """
         self.random.seed(random_seed)
+
+    def get_random_state(self):
+        """
+        Gets the state of the random instance of this unit controller.
+        """
+        return self.random.getstate()
+
+    def set_random_state(self, random_state):
+        """
+        Restores a state of the random instance of this unit controller.
+        """
+        self.random.setstate(random_state)
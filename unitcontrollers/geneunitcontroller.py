@@ -1,3 +1,6 @@
+import numpy as np
+from arraystate import ArrayState
+from state import OCCUPANCY_MIN_RADIUS
 from unitcontrollers.unitcontroller import UnitController
 
 
@@ -8,8 +11,23 @@ class GeneUnitController(UnitController):
     attack. This controller is also used to "learn" using natural computing,
     since we can learn the genes using genetic programming.
     """
-    def __init__(self, unit, state, genes):
+    gene_names = ('initiative', 'greed', 'focus', 'teamplayer', 'evasiveness')
+
+    def __init__(self, unit, state, genes, vectorized=False):
+        """
+        Initializer for a GeneUnitController, sets the genes of the unit. If
+        vectorized is set, the possible moves are scored with NumPy array
+        operations instead of one by one.
+        """
         super().__init__(unit, state)
+        self.vectorized = vectorized
+        self.set_genes(genes)
+
+    def set_genes(self, genes):
+        """
+        Sets the genes that decide how the unit acts.
+        :param genes: A dictionary with a value for every gene name.
+        """
         self.genes = genes
         self.initiative = genes['initiative']  # Turn order
         self.greed = genes['greed']  # Focus low hp over high attack
@@ -17,19 +35,35 @@ class GeneUnitController(UnitController):
         self.teamplayer = genes['teamplayer']  # Stay close to team
         self.evasiveness = genes['evasiveness']  # Evade high damage zones
 
+    @classmethod
+    def genes_from_array(cls, values):
+        """
+        Converts the gene values of an array encoded genome to the dictionary
+        of genes that set_genes takes.
+        :param values: The values of the genes, in the order of gene_names.
+        :return: A dictionary with a value for every gene name.
+        """
+        return {g: float(v) for g, v in zip(cls.gene_names, values)}
+
     def get_enemies(self):
         """
-        Gets a list of Units on the opposing team(s).
-        :return: Returns a list of Units on opposing team(s).
+        Gets the Units on the opposing team(s).
+        :return: Returns a view of the Units on opposing team(s).
         """
-        return [u for u in self.state.units if u.team != self.unit.team]
+        return self.state.enemies_of(self.unit.team)
 
     def get_allies(self):
         """
-        Gets a list of Units on the allied team.
+        Gets a list of Units on the allied team, without the Unit belonging to
+        this UnitController. The list is built once per version of the State,
+        so scoring every possible move does not build it again.
         :return: Returns a list of Units on the allied team.
         """
-        return [u for u in self.state.units if u.team == self.unit.team and u != self.unit]
+        return self.state.query(
+            ('allies', self.unit.team, self.unit.id),
+            lambda: [u for u in self.state.allies_of(self.unit.team)
+                     if u is not self.unit]
+        )
         
     def ally_distance(self, x, y, u2):
         """
@@ -90,6 +124,8 @@ class GeneUnitController(UnitController):
         :return: the sum total of damage that could be dealt to this unit if
                  the unit chooses to move to position (x, y).
         """
+        if self.state.attack_fields is not None:
+            return int(self.state.threat(self.unit.team, (x, y)))
         return sum([e.atk for e in self.get_enemies()
                     if self.within_attack_distance(x, y, e)])
 
@@ -119,19 +155,22 @@ class GeneUnitController(UnitController):
         """
         Obtain the maximum hp of all enemies.
         """
-        return max(e.hp for e in self.get_enemies())
+        return self.state.query(('max_hp', self.unit.team),
+                                lambda: max(e.hp for e in self.get_enemies()))
 
     def get_highest_atk(self):
         """
         Obtain the maximum attack of all enemies.
         """
-        return max(e.atk for e in self.get_enemies())
+        return self.state.query(('max_atk', self.unit.team),
+                                lambda: max(e.atk for e in self.get_enemies()))
 
     def get_sum_atk(self):
         """
-        Obtain the maximum attack of all enemies.
+        Obtain the summed attack of all enemies.
         """
-        return sum(e.atk for e in self.get_enemies())
+        return self.state.query(('sum_atk', self.unit.team),
+                                lambda: sum(e.atk for e in self.get_enemies()))
 
     def in_walking_range(self, unit):
         """
@@ -149,8 +188,13 @@ class GeneUnitController(UnitController):
         :param enemies: enemies to sort.
         :return: Sorted enemies based on which enemy is most appealing.
         """
-        inv_scale_hp = lambda u: 1 - (u.hp / self.get_highest_hp())
-        scale_atk = lambda u: u.atk / self.get_highest_atk()
+        enemies = list(enemies)
+        if not enemies:
+            return enemies
+        highest_hp = self.get_highest_hp()
+        highest_atk = self.get_highest_atk()
+        inv_scale_hp = lambda u: 1 - (u.hp / highest_hp)
+        scale_atk = lambda u: u.atk / highest_atk
         focus_modifier = lambda u: self.in_walking_range(u) * self.focus
         targets = sorted(
             enemies, 
@@ -170,10 +214,38 @@ class GeneUnitController(UnitController):
         targets.
         :return: The enemy that looks most appealing to attack to this unit.
         """
+        if isinstance(self.state, ArrayState):
+            rows = self.state.rows_of(self.unit.team, enemies=True)
+            if len(rows):
+                return self.state.row_units[rows[np.argmin(
+                    self._appeal(rows, rows))]]
+            return None
         targets = self.get_sorted_appealing_enemies(self.get_enemies())
         if targets:
             return targets[0]
 
+    def _appeal(self, rows, enemy_rows):
+        """
+        Scores the enemies on rows of an ArrayState at once with the sort key
+        of get_sorted_appealing_enemies, such that the first lowest score is
+        the first enemy of the sorted enemies.
+        :param rows: The rows of the enemies to score.
+        :param enemy_rows: The rows of all enemies, which give the highest hp
+                           and attack the scores are scaled by.
+        :return: An array with a score per row.
+        """
+        state = self.state
+        highest_hp = state.hp[enemy_rows].max()
+        highest_atk = state.atk[enemy_rows].max()
+        in_walking_range = np.abs(np.abs(state.x[rows] - self.unit.x) +
+                                  np.abs(state.y[rows] - self.unit.y) -
+                                  self.unit.range) < self.unit.move
+        return -(
+            (1 - (state.hp[rows] / highest_hp)) * self.greed +
+            (state.atk[rows] / highest_atk) * (1 - self.greed) +
+            in_walking_range * self.focus
+        )
+
     def evasiveness_score(self, summed_atk, x, y):
         norm_attack =  summed_atk / (self.max_expected_damage(x, y) + 1e-3)
         return norm_attack * self.evasiveness
@@ -186,28 +258,150 @@ class GeneUnitController(UnitController):
         :return: A list of possible movement actions if any were found,
                  None otherwise.
         """
+        return self._decide_movement(approach=False)
+
+    def _decide_movement(self, approach):
+        """
+        Decides the movement action for next_movement and approach_movement.
+        In an approach turn no enemy can reach any of the possible moves, so
+        the expected damage is 0 for every move and the enemies are not
+        checked for it.
+        :param approach: Whether the turn is an approach turn.
+        :return: A possible movement action if any was found, None otherwise.
+        """
         enemy = self.get_most_appealing_enemy()
-        moves = self.possible_moves()
         sum_atk = self.get_sum_atk()
 
-        sorted_moves = list(
-            sorted(
-                moves,
-                key=lambda m: self.distance(*m, enemy) -
-                              self.mlp_score(*m) * 3 +
-                              self.evasiveness_score(sum_atk, *m) * 3
+        if (self.vectorized and enemy is not None and
+                self.state.occupancy is not None and
+                self.unit.move >= OCCUPANCY_MIN_RADIUS):
+            moves = self.state.free_cells_array(self.unit, self.unit.move)
+            if len(moves):
+                best = self.best_move_index(moves, enemy, sum_atk, approach)
+                return tuple(int(v) for v in moves[best])
+            return None
+
+        moves = self.possible_moves()
+        if self.vectorized and enemy is not None:
+            if moves:
+                return moves[self.best_move_index(moves, enemy, sum_atk,
+                                                  approach)]
+            return None
+
+        if approach:
+            evasiveness = (sum_atk / (0 + 1e-3)) * self.evasiveness
+            sorted_moves = list(
+                sorted(
+                    moves,
+                    key=lambda m: self.distance(*m, enemy) -
+                                  self.mlp_score(*m) * 3 +
+                                  evasiveness * 3
+                )
+            )
+        else:
+            sorted_moves = list(
+                sorted(
+                    moves,
+                    key=lambda m: self.distance(*m, enemy) -
+                                  self.mlp_score(*m) * 3 +
+                                  self.evasiveness_score(sum_atk, *m) * 3
+                )
             )
-        )
 
         if sorted_moves:
             return sorted_moves[0]
 
+    def _army(self, enemies):
+        """
+        Gets the positions, ranges and attacks of the allies (without this
+        unit) or of the enemies as arrays. These are taken from the columns
+        of an ArrayState, or collected from the Units otherwise.
+        :param enemies: Whether to get the enemies instead of the allies.
+        :return: A tuple of x, y, range and atk arrays.
+        """
+        if isinstance(self.state, ArrayState):
+            rows = self.state.rows_of(self.unit.team, enemies=enemies)
+            if not enemies:
+                rows = rows[rows != self.state.rows[self.unit.id]]
+            return tuple(getattr(self.state, c)[rows]
+                         for c in ('x', 'y', 'range', 'atk'))
+        units = list(self.get_enemies()) if enemies else self.get_allies()
+        return tuple(np.array([getattr(u, c) for u in units], dtype=np.int64)
+                     for c in ('x', 'y', 'range', 'atk'))
+
+    @staticmethod
+    def _distances(moves, xs, ys):
+        """
+        Calculates the Manhattan distance between every move and every unit.
+        :param moves: An array of positions, one row per move.
+        :param xs: The x-positions of the units.
+        :param ys: The y-positions of the units.
+        :return: A moves x units array of distances.
+        """
+        return (np.abs(moves[:, 0:1] - xs[np.newaxis, :]) +
+                np.abs(moves[:, 1:2] - ys[np.newaxis, :]))
+
+    def best_move_index(self, moves, enemy, sum_atk, approach=False):
+        """
+        Scores all moves at once with the same score as next_movement, using
+        a moves x units distance matrix for the allies and the enemies.
+        :param moves: The (non-empty) list or array of possible moves.
+        :param enemy: The most appealing enemy.
+        :param sum_atk: The summed attack of all enemies.
+        :param approach: Whether no enemy can reach any of the moves, such
+                         that the expected damage is 0 for every move.
+        :return: The index of the first move with the lowest score.
+        """
+        moves = np.array(moves, dtype=np.int64)
+
+        distance = np.abs(np.abs(moves[:, 0] - enemy.x) +
+                          np.abs(moves[:, 1] - enemy.y) - self.unit.range)
+
+        xs, ys, ranges, _ = self._army(enemies=False)
+        allies_in_range = (self._distances(moves, xs, ys) <=
+                           ranges).sum(axis=1)
+        mlp = (allies_in_range / (len(xs) + 0.001)) * self.teamplayer
+
+        if approach:
+            expected_damage = 0
+        elif self.state.attack_fields is not None:
+            expected_damage = self.state.threat(self.unit.team,
+                                                (moves[:, 0], moves[:, 1]))
+        else:
+            xs, ys, ranges, atks = self._army(enemies=True)
+            threatened = self._distances(moves, xs, ys) - ranges <= 0
+            expected_damage = (threatened * atks).sum(axis=1)
+        evasiveness = (sum_atk / (expected_damage + 1e-3)) * self.evasiveness
+
+        return int(np.argmin(distance - mlp * 3 + evasiveness * 3))
+
+    def approach_movement(self):
+        """
+        Decides the movement action in a turn in which no enemy can reach any
+        of the possible moves. Every possible move is still scored on its
+        distance to the most appealing enemy and its allies around, but the
+        expected damage is 0 for every move, so the evasiveness score is
+        computed once instead of checking every enemy for every move.
+        :return: The same move as next_movement.
+        """
+        return self._decide_movement(approach=True)
+
     def next_attack(self):
         """
         Acts out an attack on the lowest enemy Unit if an attack can be made on
         that Unit.
         :return: The enemy to be attacked if one is chosen, None otherwise.
         """
+        state = self.state
+        if isinstance(state, ArrayState):
+            rows = state.rows_of(self.unit.team, enemies=True)
+            targets = rows[np.abs(state.x[rows] - self.unit.x) +
+                           np.abs(state.y[rows] - self.unit.y) ==
+                           self.unit.range]
+            if len(targets):
+                return state.row_units[targets[np.argmin(
+                    self._appeal(targets, rows))]]
+            return None
         attacks = filter(
             lambda x: self.state.attack_allowed(self.unit, x), 
             self.get_enemies()
@@ -31,6 +31,16 @@ class UnitController(abc.ABC):
         """
         ...
 
+    def approach_movement(self):
+        """
+        Function that gives back the movement action in a turn in which no
+        unit can attack, be attacked or come within walking range of an enemy.
+        It must give back the same move as next_movement would, but can skip
+        the parts of the decision that do not matter in such a turn. By
+        default, this simply calls next_movement.
+        """
+        return self.next_movement()
+
     @abc.abstractmethod 
     def next_attack(self):
         """
@@ -54,15 +64,7 @@ class UnitController(abc.ABC):
         :return: A list of all possible movement actions for the Unit 
                     belonging to this UnitController.
         """
-        res = []
-        lower_x_range = self.unit.x - self.unit.move
-        upper_x_range = self.unit.x + self.unit.move + 1
-        for x in range(lower_x_range, upper_x_range):
-            diff = self.unit.move - abs(self.unit.x - x)
-            for y in range(self.unit.y - diff, self.unit.y + diff + 1):
-                if self.state.movement_allowed(self.unit, (x, y)):
-                    res.append((x, y))
-        return res
+        return list(self.state.free_cells(self.unit, self.unit.move))
 
     def seed_random(self, random_seed):
         """
@@ -71,3 +73,19 @@ class UnitController(abc.ABC):
         :param random_seed: the random seed to set.
         """
         pass
+
+    def get_random_state(self):
+        """
+        Gets the state of the random instance of this unit controller, to
+        checkpoint it. By default, there is none.
+        :return: The state of the random instance, or None.
+        """
+        return None
+
+    def set_random_state(self, random_state):
+        """
+        Restores a state of the random instance of this unit controller from
+        get_random_state. By default, this does nothing.
+        :param random_state: The state to restore.
+        """
+        pass